@@ -1,7 +1,7 @@
 {
     "name": "HR Resource Planner",
     "summary": "",
-    "version": "16.0.1.0.7",
+    "version": "16.0.1.1.0",
     "category": "Human Resources",
     "website": "https://github.com/OCA/resource",
     "author": "Binhex, Odoo Community Association (OCA)",
@@ -16,8 +16,12 @@
         "data/hr_task_ir_cron.xml",
         "views/hr_task_views.xml",
         "views/project_views.xml",
+        "views/hr_employee_views.xml",
         "wizard/create_hr_task_views.xml",
         "views/menus.xml",
+        "views/hr_task_perf_sample_views.xml",
+        "views/hr_task_history_views.xml",
+        "views/hr_task_utilization_views.xml",
     ],
     "license": "AGPL-3",
     "application": False,
@@ -0,0 +1,250 @@
+import csv
+import hashlib
+import io
+from datetime import datetime, time, timedelta
+
+import pytz
+from werkzeug.exceptions import BadRequest, NotFound
+from werkzeug.http import http_date
+
+from odoo import api, fields, http
+from odoo.http import Response, content_disposition, request
+
+EXPORT_CHUNK_SIZE = 500
+# Days of past shifts published in the calendar feed
+ICAL_PAST_DAYS = 31
+ICAL_LINE_LENGTH = 75
+CSV_FIELDS = [
+    "employee_id",
+    "name",
+    "type",
+    "date_start",
+    "date_end",
+    "allocated_hours",
+    "state",
+]
+
+
+def _ical_escape(value):
+    return (
+        (value or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def _ical_line(name, value):
+    """Returns a content line, folded at 75 characters as RFC 5545 requires."""
+    line = f"{name}:{value}"
+    chunks = [line[:ICAL_LINE_LENGTH]] + [
+        " " + line[index : index + ICAL_LINE_LENGTH - 1]
+        for index in range(ICAL_LINE_LENGTH, len(line), ICAL_LINE_LENGTH - 1)
+    ]
+    return "\r\n".join(chunks) + "\r\n"
+
+
+def _ical_datetime(value):
+    return value.strftime("%Y%m%dT%H%M%SZ")
+
+
+class HrPlanningExport(http.Controller):
+    @http.route(
+        "/hr_planning_resources/calendar/<string:token>.ics",
+        type="http",
+        auth="public",
+        methods=["GET"],
+    )
+    def planning_calendar(self, token):
+        """iCalendar feed of the shifts of the employee owning the token."""
+        employee = (
+            request.env["hr.employee"]
+            .sudo()
+            .search([("planning_calendar_token", "=", token)], limit=1)
+        )
+        if not token or not employee:
+            raise NotFound()
+        # The bound moves once a day, so that the ETag stays stable meanwhile
+        date_from = datetime.combine(
+            fields.Date.today() - timedelta(days=ICAL_PAST_DAYS), time.min
+        )
+        domain = [
+            ("employee_id", "=", employee.id),
+            ("state", "!=", "cancel"),
+            ("date_end", ">=", date_from),
+        ]
+        return self._stream_tasks(
+            request.env["hr.task"].sudo(),
+            domain,
+            self._generate_ical,
+            [("Content-Type", "text/calendar; charset=utf-8")],
+            calendar_name=employee.name,
+        )
+
+    @http.route(
+        "/hr_planning_resources/export/csv",
+        type="http",
+        auth="user",
+        methods=["GET"],
+    )
+    def planning_csv(self, date_from, date_to, employee_ids=None):
+        """CSV of the tasks overlapping a period, with their allocated hours."""
+        date_from, date_to, employee_ids = self._parse_csv_params(
+            date_from, date_to, employee_ids
+        )
+        domain = [
+            ("date_start", "<", date_to),
+            ("date_end", ">", date_from),
+        ]
+        if employee_ids:
+            domain.append(("employee_id", "in", employee_ids))
+        return self._stream_tasks(
+            request.env["hr.task"],
+            domain,
+            self._generate_csv,
+            [
+                ("Content-Type", "text/csv; charset=utf-8"),
+                ("Content-Disposition", content_disposition("planning.csv")),
+            ],
+        )
+
+    def _parse_csv_params(self, date_from, date_to, employee_ids):
+        """
+        Validates the parameters of the CSV export.
+
+        Returns:
+            tuple: Start and end of the period as datetimes, and the list of
+            employee ids
+
+        Raises:
+            BadRequest: When a parameter is malformed or the period is empty
+        """
+        try:
+            date_from = fields.Datetime.to_datetime(date_from)
+            date_to = fields.Datetime.to_datetime(date_to)
+            employee_ids = [
+                int(employee_id)
+                for employee_id in (employee_ids or "").split(",")
+                if employee_id
+            ]
+        except ValueError as e:
+            raise BadRequest(str(e)) from e
+        if not date_from or not date_to or date_from > date_to:
+            raise BadRequest("date_from and date_to must delimit a period")
+        return date_from, date_to, employee_ids
+
+    def _stream_tasks(self, HrTask, domain, generator, headers, **kwargs):
+        """
+        Streams the tasks matching a domain, or answers 304 when unchanged.
+
+        Args:
+            HrTask: hr.task model, with the environment to read the tasks with
+            domain (list): Tasks to export
+            generator (callable): Yields the chunks of the document from an
+                environment, the task ids and ``kwargs``
+            headers (list): Headers of the response
+
+        Note:
+            - The validators come from the latest write date and the number
+              of tasks, so deleting a task changes the ETag as well
+            - The generator reads the tasks by chunks with its own cursor, as
+              the cursor of the request is closed once the response is
+              returned
+        """
+        groups = HrTask._read_group(domain, ["write_date:max"], [])
+        last_modified = groups and groups[0]["write_date"]
+        task_count = groups and groups[0]["__count"]
+        etag = hashlib.sha1(
+            repr((last_modified, task_count, domain)).encode()
+        ).hexdigest()
+        validators = [("ETag", f'"{etag}"'), ("Cache-Control", "no-cache")]
+        if last_modified:
+            last_modified = pytz.utc.localize(last_modified.replace(microsecond=0))
+            validators.append(("Last-Modified", http_date(last_modified)))
+
+        httprequest = request.httprequest
+        if httprequest.if_none_match:
+            not_modified = httprequest.if_none_match.contains(etag)
+        else:
+            not_modified = bool(
+                last_modified
+                and httprequest.if_modified_since
+                and last_modified <= httprequest.if_modified_since
+            )
+        if not_modified:
+            return Response(status=304, headers=validators)
+
+        task_ids = HrTask.search(domain, order="date_start, id").ids
+        registry = HrTask.env.registry
+        uid = HrTask.env.uid
+        context = dict(HrTask.env.context)
+        su = HrTask.env.su
+
+        def stream():
+            with registry.cursor() as cr:
+                env = api.Environment(cr, uid, context, su=su)
+                for chunk in generator(env, task_ids, **kwargs):
+                    yield chunk.encode()
+
+        return request.make_response(stream(), headers=headers + validators)
+
+    def _read_chunks(self, env, task_ids, field_names):
+        """Yields the tasks read by chunks, emptying the cache in between."""
+        HrTask = env["hr.task"]
+        for index in range(0, len(task_ids), EXPORT_CHUNK_SIZE):
+            yield HrTask.browse(task_ids[index : index + EXPORT_CHUNK_SIZE]).read(
+                field_names
+            )
+            env.invalidate_all()
+
+    def _generate_ical(self, env, task_ids, calendar_name=""):
+        yield (
+            "BEGIN:VCALENDAR\r\n"
+            "VERSION:2.0\r\n"
+            "PRODID:-//OCA//hr_planning_resources//EN\r\n"
+            "CALSCALE:GREGORIAN\r\n"
+        )
+        yield _ical_line("X-WR-CALNAME", _ical_escape(calendar_name))
+        field_names = ["name", "date_start", "date_end", "write_date"]
+        for tasks in self._read_chunks(env, task_ids, field_names):
+            yield "".join(
+                "BEGIN:VEVENT\r\n"
+                + _ical_line("UID", f"hr-task-{task['id']}@{env.cr.dbname}")
+                + _ical_line("DTSTAMP", _ical_datetime(task["write_date"]))
+                + _ical_line("DTSTART", _ical_datetime(task["date_start"]))
+                + _ical_line("DTEND", _ical_datetime(task["date_end"]))
+                + _ical_line("SUMMARY", _ical_escape(task["name"]))
+                + "END:VEVENT\r\n"
+                for task in tasks
+            )
+        yield "END:VCALENDAR\r\n"
+
+    def _generate_csv(self, env, task_ids):
+        HrTask = env["hr.task"]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(
+            [
+                HrTask._fields[field_name].get_description(env)["string"]
+                for field_name in CSV_FIELDS
+            ]
+        )
+        for tasks in self._read_chunks(env, task_ids, CSV_FIELDS):
+            for task in tasks:
+                writer.writerow(
+                    [
+                        task["employee_id"] and task["employee_id"][1],
+                        task["name"],
+                        task["type"],
+                        fields.Datetime.to_string(task["date_start"]),
+                        fields.Datetime.to_string(task["date_end"]),
+                        task["allocated_hours"],
+                        task["state"],
+                    ]
+                )
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
@@ -5,3 +5,14 @@ from . import project_project
 from . import project_task
 from . import helpdesk_ticket
 from . import hr_task_recurrency
+from . import resource_calendar_leaves
+from . import hr_employee
+from . import hr_employee_capacity
+from . import resource_calendar_attendance
+from . import hr_task_scheduler
+from . import hr_task_perf_sample
+from . import resource_calendar
+from . import resource_resource
+from . import hr_task_archive
+from . import hr_task_history
+from . import hr_task_utilization
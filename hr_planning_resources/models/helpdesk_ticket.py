@@ -5,12 +5,7 @@ class HelpdeskTicket(models.Model):
     _name = "helpdesk.ticket"
     _inherit = ["helpdesk.ticket", "hr.task.mixin"]
 
-    def _compute_hr_task_count(self):
-        for record in self:
-            ticket_count = self.env["hr.task"].search_count(
-                [("ticket_id", "=", record.id)]
-            )
-            record.hr_task_count = ticket_count
+    _hr_task_field = "ticket_id"
 
     @api.model_create_multi
     def create(self, vals_list):
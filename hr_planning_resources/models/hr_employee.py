@@ -0,0 +1,42 @@
+import uuid
+
+from odoo import api, fields, models
+
+
+class HrEmployee(models.Model):
+    _inherit = "hr.employee"
+
+    planning_calendar_token = fields.Char(
+        copy=False, readonly=True, index=True, groups="hr.group_hr_user"
+    )
+    planning_calendar_url = fields.Char(
+        compute="_compute_planning_calendar_url",
+        groups="hr.group_hr_user",
+        help="Address of the calendar feed of the planned shifts of the employee",
+    )
+
+    @api.depends("planning_calendar_token")
+    def _compute_planning_calendar_url(self):
+        for employee in self:
+            token = employee.planning_calendar_token
+            employee.planning_calendar_url = token and (
+                f"{employee.get_base_url()}/hr_planning_resources/calendar/{token}.ics"
+            )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        employees = super().create(vals_list)
+        self.env["hr.employee.capacity"]._schedule_refresh(employees)
+        return employees
+
+    def write(self, vals):
+        result = super().write(vals)
+        # The timezone is the one of the resource, refreshed by its write
+        if "resource_calendar_id" in vals:
+            self.env["hr.employee.capacity"]._schedule_refresh(self)
+        return result
+
+    def action_reset_planning_calendar_token(self):
+        """Publishes the calendar feed at a new address."""
+        for employee in self:
+            employee.planning_calendar_token = uuid.uuid4().hex
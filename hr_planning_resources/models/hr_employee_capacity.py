@@ -0,0 +1,232 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+import pytz
+
+from odoo import api, fields, models
+
+
+def _hours_per_day(intervals):
+    """Sum the hours of ``(start, stop, meta)`` intervals by local date."""
+    hours = defaultdict(float)
+    for start, stop, _meta in intervals:
+        hours[start.date()] += (stop - start).total_seconds() / 3600
+    return hours
+
+
+def _bounds_per_day(intervals):
+    """Return the first start and last stop of sorted intervals by local date.
+
+    The bounds are naive UTC datetimes, as stored by the ORM.
+    """
+    bounds = {}
+    for start, stop, _meta in intervals:
+        day = start.date()
+        start = start.astimezone(pytz.utc).replace(tzinfo=None)
+        stop = stop.astimezone(pytz.utc).replace(tzinfo=None)
+        bounds[day] = (bounds.get(day, (start,))[0], stop)
+    return bounds
+
+
+class HrEmployeeCapacity(models.Model):
+    _name = "hr.employee.capacity"
+    _description = "Employee Daily Capacity"
+    _order = "date, employee_id"
+    _sql_constraints = [
+        (
+            "employee_date_uniq",
+            "UNIQUE (employee_id, date)",
+            "The capacity of an employee must be unique per day!",
+        ),
+    ]
+
+    employee_id = fields.Many2one(
+        "hr.employee", required=True, readonly=True, ondelete="cascade"
+    )
+    company_id = fields.Many2one(
+        "res.company", related="employee_id.company_id", store=True
+    )
+    date = fields.Date(required=True, readonly=True, index=True)
+    capacity_hours = fields.Float(
+        readonly=True, help="Hours of the working schedule on this day"
+    )
+    leave_hours = fields.Float(
+        readonly=True, help="Working hours lost to time off and public holidays"
+    )
+    work_start = fields.Datetime(
+        readonly=True, help="Start of the first working period of the day"
+    )
+    work_stop = fields.Datetime(
+        readonly=True, help="End of the last working period of the day"
+    )
+
+    @api.model
+    def _get_horizon_end(self):
+        horizon = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("hr_planning_resources.capacity_horizon_days", 90)
+        )
+        return fields.Date.context_today(self) + timedelta(days=horizon)
+
+    @api.model
+    def _refresh(self, employees, date_from, date_to):
+        """
+        Computes again the capacity of employees between two dates.
+
+        Args:
+            employees: hr.employee records
+            date_from (date): First day to compute
+            date_to (date): Last day to compute, capped to the rolling horizon
+
+        Note:
+            - Each calendar is expanded once for all its employees
+            - Days are those of the employee's timezone, and every day gets a
+              row, so that a missing row means the day is not computed yet
+        """
+        date_to = min(date_to, self._get_horizon_end())
+        if not employees or date_from > date_to:
+            return
+        self = self.sudo()
+        # One more day on each side covers the timezone offsets
+        start = pytz.utc.localize(
+            datetime.combine(date_from - timedelta(days=1), time.min)
+        )
+        end = pytz.utc.localize(datetime.combine(date_to + timedelta(days=1), time.max))
+
+        employees_by_calendar = defaultdict(lambda: self.env["hr.employee"])
+        for employee in employees:
+            employees_by_calendar[employee.resource_calendar_id] |= employee
+
+        vals_list = []
+        for calendar, calendar_employees in employees_by_calendar.items():
+            if not calendar:
+                continue
+            resources = calendar_employees.resource_id
+            attendances = calendar._attendance_intervals_batch(start, end, resources)
+            work_intervals = calendar._work_intervals_batch(start, end, resources)
+            for employee in calendar_employees:
+                resource_id = employee.resource_id.id
+                capacity = _hours_per_day(attendances[resource_id])
+                available = _hours_per_day(work_intervals[resource_id])
+                bounds = _bounds_per_day(work_intervals[resource_id])
+                for offset in range((date_to - date_from).days + 1):
+                    day = date_from + timedelta(days=offset)
+                    hours = capacity.get(day, 0.0)
+                    work_start, work_stop = bounds.get(day, (False, False))
+                    vals_list.append(
+                        {
+                            "employee_id": employee.id,
+                            "date": day,
+                            "capacity_hours": hours,
+                            "leave_hours": max(0.0, hours - available.get(day, 0.0)),
+                            "work_start": work_start,
+                            "work_stop": work_stop,
+                        }
+                    )
+
+        self.search(
+            [
+                ("employee_id", "in", employees.ids),
+                ("date", ">=", date_from),
+                ("date", "<=", date_to),
+            ]
+        ).unlink()
+        self.create(vals_list)
+
+    @api.model
+    def _schedule_refresh(self, employees):
+        """
+        Drops the upcoming capacity of employees and triggers its computation.
+
+        Until the cron has run, the planning computations read the working
+        schedules again for the days without capacity.
+        """
+        if not employees:
+            return
+        self.flush_model()
+        self.env.cr.execute(
+            "DELETE FROM hr_employee_capacity WHERE employee_id IN %s AND date >= %s",
+            (tuple(employees.ids), fields.Date.context_today(self)),
+        )
+        self.invalidate_model()
+        cron = self.env.ref("hr_planning_resources.ir_cron_hr_employee_capacity", False)
+        if cron:
+            cron.sudo()._trigger()
+
+    @api.model
+    def _schedule_refresh_calendars(self, calendars):
+        """Schedules the capacity of the employees working with calendars."""
+        self._schedule_refresh(
+            self.env["hr.employee"]
+            .sudo()
+            .search([("resource_calendar_id", "in", calendars.ids)])
+        )
+
+    @api.model
+    def _get_daily_capacity(self, employees, date_from, date_to):
+        """
+        Reads the computed days of employees between two dates with one query.
+
+        Args:
+            employees: hr.employee records
+            date_from (date): First local day
+            date_to (date): Last local day
+
+        Returns:
+            dict: By employee id, the ``{"available_hours": float,
+            "work_start": datetime, "work_stop": datetime}`` of each computed
+            day, the days not computed yet being missing
+        """
+        result = defaultdict(dict)
+        rows = self.sudo().search_read(
+            [
+                ("employee_id", "in", employees.ids),
+                ("date", ">=", date_from),
+                ("date", "<=", date_to),
+            ],
+            ["employee_id", "date", "capacity_hours", "leave_hours"]
+            + ["work_start", "work_stop"],
+            load=None,
+        )
+        for row in rows:
+            result[row["employee_id"]][row["date"]] = {
+                "available_hours": row["capacity_hours"] - row["leave_hours"],
+                "work_start": row["work_start"],
+                "work_stop": row["work_stop"],
+            }
+        return result
+
+    @api.model
+    def _cron_fill_horizon(self):
+        """
+        Fills the capacity of every employee up to the rolling horizon.
+
+        Employees whose upcoming days are computed without gap are continued
+        after their last day, the others are computed again from today.
+        """
+        today = fields.Date.context_today(self)
+        horizon_end = self._get_horizon_end()
+        lines = {
+            line["employee_id"][0]: line
+            for line in self.sudo()._read_group(
+                [("date", ">=", today)],
+                ["employee_id", "date:max"],
+                ["employee_id"],
+            )
+        }
+        employees_by_start = defaultdict(lambda: self.env["hr.employee"])
+        employees = (
+            self.env["hr.employee"]
+            .sudo()
+            .search([("resource_calendar_id", "!=", False)])
+        )
+        for employee in employees:
+            line = lines.get(employee.id)
+            date_from = today
+            if line and line["employee_id_count"] == (line["date"] - today).days + 1:
+                date_from = line["date"] + timedelta(days=1)
+            if date_from <= horizon_end:
+                employees_by_start[date_from] |= employee
+        for date_from, employees in employees_by_start.items():
+            self._refresh(employees, date_from, horizon_end)
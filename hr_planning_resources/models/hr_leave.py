@@ -1,13 +1,18 @@
 from collections import defaultdict
 from datetime import timedelta
 from functools import lru_cache
-from itertools import groupby
+from itertools import groupby, product
+from operator import itemgetter
 
 from pytz import timezone, utc
 
 from odoo import _, api, models
 from odoo.tools.misc import get_lang
 
+from .hr_task_perf_sample import profiled
+
+LEAVE_WARNING_FIELDS = {"employee_id", "state", "date_from", "date_to"}
+
 
 def format_time(env, time):
     return time.strftime(get_lang(env).time_format)
@@ -20,7 +25,41 @@ def format_date(env, date):
 class HrLeave(models.Model):
     _inherit = "hr.leave"
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        leaves = super().create(vals_list)
+        leaves._get_overlapping_hr_tasks()._recompute_leave_warning()
+        return leaves
+
+    def write(self, vals):
+        if not LEAVE_WARNING_FIELDS.intersection(vals):
+            return super().write(vals)
+        # Tasks overlapping the leaves before and after the change
+        tasks = self._get_overlapping_hr_tasks()
+        result = super().write(vals)
+        tasks |= self._get_overlapping_hr_tasks()
+        tasks._recompute_leave_warning()
+        return result
+
+    def unlink(self):
+        tasks = self._get_overlapping_hr_tasks()
+        result = super().unlink()
+        tasks._recompute_leave_warning()
+        return result
+
+    def _get_overlapping_hr_tasks(self):
+        """Return the hr.task records whose leave warning depends on the leaves."""
+        HrTask = self.env["hr.task"].sudo()
+        tasks = HrTask
+        for leave in self:
+            if leave.employee_id and leave.date_from and leave.date_to:
+                tasks |= HrTask._search_overlapping(
+                    leave.employee_id, leave.date_from, leave.date_to
+                )
+        return tasks
+
     @api.model
+    @profiled
     def _get_leaves(self, date_from, date_to, employee_ids):
         calendar_leaves = self._get_calendar_leaves(date_from, date_to, employee_ids)
         leaves = self._group_leaves_by_employee(calendar_leaves, employee_ids)
@@ -46,23 +85,33 @@ class HrLeave(models.Model):
         )
 
     def _group_leaves_by_employee(self, calendar_leaves, employee_ids):
+        # Bucket the leaves by (company, resource, calendar), False meaning that
+        # the leave applies to any value, so each employee only has to look up
+        # the eight combinations of its own keys.
+        buckets = defaultdict(list)
+        for sequence, leave in enumerate(calendar_leaves):
+            key = (
+                leave.company_id.id,
+                leave.resource_id.id,
+                leave.calendar_id.id,
+            )
+            buckets[key].append((sequence, leave))
+
         leaves = defaultdict(list)
-        for leave in calendar_leaves:
-            for employee in employee_ids:
-                if self._is_leave_relevant_to_employee(leave, employee):
-                    leaves[employee.id].append(leave)
+        for employee in employee_ids:
+            employee_leaves = []
+            for key in product(
+                {False, employee.company_id.id},
+                {False, employee.resource_id.id},
+                {False, employee.resource_calendar_id.id},
+            ):
+                employee_leaves += buckets.get(key, [])
+            if employee_leaves:
+                # Keep the order of calendar_leaves
+                employee_leaves.sort(key=itemgetter(0))
+                leaves[employee.id] = [leave for _seq, leave in employee_leaves]
         return leaves
 
-    def _is_leave_relevant_to_employee(self, leave, employee):
-        return (
-            (not leave.company_id or leave.company_id == employee.company_id)
-            and (not leave.resource_id or leave.resource_id == employee.resource_id)
-            and (
-                not leave.calendar_id
-                or leave.calendar_id == employee.resource_calendar_id
-            )
-        )
-
     def _get_hr_leaves(self, date_from, date_to, employee_ids):
         return self.env["hr.leave"].search(
             [
@@ -74,20 +123,52 @@ class HrLeave(models.Model):
             order="date_from",
         )
 
-    def _get_leave_message_warning(self, leaves, employee, date_from, date_to):
+    def _get_leave_message_warning(
+        self,
+        leaves,
+        employee,
+        date_from,
+        date_to,
+        work_times=None,
+        formatted_periods=None,
+    ):
+        """
+        Builds the time off warning of an employee over a period.
+
+        Args:
+            leaves (list): Leaves of the employee, ordered by start
+            employee: hr.employee record
+            date_from (datetime): Start of the period (naive UTC)
+            date_to (datetime): End of the period (naive UTC)
+            work_times (optional): Days worked during the period, computed when
+                not given
+            formatted_periods (dict, optional): Formatted periods to reuse across
+                the calls for the same employee
+
+        Note:
+            - The dates are formatted in the language and time zone of the
+              context, not in the ones of the current user
+        """
+        if formatted_periods is None:
+            formatted_periods = {}
+
         @lru_cache(None)
         def localize(date):
             return (
                 utc.localize(date)
-                .astimezone(timezone(self.env.user.tz or "UTC"))
+                .astimezone(timezone(self.env.context.get("tz") or "UTC"))
                 .replace(tzinfo=None)
             )
 
         def format_period_leave(period, prefix):
             dfrom = period["from"]
             dto = period["to"]
-            if period.get("show_hours", False):
-                return _(
+            show_hours = period.get("show_hours", False)
+            key = (prefix, dfrom, dto, show_hours)
+            if key in formatted_periods:
+                return formatted_periods[key]
+            if show_hours:
+                formatted = _(
                     "{prefix} from the {dfrom_date} at {dfrom_time} to "
                     "the {dto_date} at {dto_time}"
                 ).format(
@@ -98,14 +179,18 @@ class HrLeave(models.Model):
                     dto_time=format_time(self.env, localize(dto)),
                 )
             else:
-                return _("{prefix} from the {dfrom} to the {dto}").format(
+                formatted = _("{prefix} from the {dfrom} to the {dto}").format(
                     prefix=prefix,
                     dfrom=format_date(self.env, localize(dfrom)),
                     dto=format_date(self.env, localize(dto)),
                 )
+            formatted_periods[key] = formatted
+            return formatted
 
         warning = ""
-        periods = self._group_leaves(leaves, employee, date_from, date_to)
+        periods = self._group_leaves(
+            leaves, employee, date_from, date_to, work_times=work_times
+        )
         periods_by_states = [
             list(b) for _, b in groupby(periods, key=lambda x: x["is_validated"])
         ]
@@ -130,8 +215,9 @@ class HrLeave(models.Model):
             )
         return warning
 
-    def _group_leaves(self, leaves, employee_id, date_from, date_to):
-        work_times = self._get_work_times(employee_id, date_from, date_to)
+    def _group_leaves(self, leaves, employee_id, date_from, date_to, work_times=None):
+        if work_times is None:
+            work_times = self._get_work_times(employee_id, date_from, date_to)
         periods = []
 
         for leave in leaves:
@@ -158,6 +244,19 @@ class HrLeave(models.Model):
         return periods
 
     def _get_work_times(self, employee_id, date_from, date_to):
+        # The computed capacity of the employee spares the calendar expansion
+        tz = timezone(employee_id.tz or "UTC")
+        first_day = utc.localize(date_from).astimezone(tz).date()
+        last_day = utc.localize(date_to).astimezone(tz).date()
+        capacity = self.env["hr.employee.capacity"]._get_daily_capacity(
+            employee_id, first_day, last_day
+        )[employee_id.id]
+        if len(capacity) == (last_day - first_day).days + 1:
+            return {
+                day: day_capacity["available_hours"]
+                for day, day_capacity in capacity.items()
+                if day_capacity["available_hours"] > 0
+            }
         return {
             wk[0]: wk[1]
             for wk in employee_id.list_work_time_per_day(date_from, date_to)
@@ -175,11 +274,16 @@ class HrLeave(models.Model):
             return number_of_days, True
 
     def _has_working_hours(self, start_dt, end_dt, work_times):
-        diff_days = (end_dt - start_dt).days
-        all_dates = [
-            start_dt.date() + timedelta(days=delta) for delta in range(diff_days + 1)
-        ]
-        return any(d in work_times for d in all_dates)
+        date_from = start_dt.date()
+        date_to = date_from + timedelta(days=(end_dt - start_dt).days)
+        if len(work_times) <= (date_to - date_from).days:
+            return any(date_from <= day <= date_to for day in work_times)
+        day = date_from
+        while day <= date_to:
+            if day in work_times:
+                return True
+            day += timedelta(days=1)
+        return False
 
     def _update_existing_period(self, period, leave, is_validated, number_of_days):
         period["is_validated"] = is_validated
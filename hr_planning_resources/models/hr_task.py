@@ -1,9 +1,40 @@
-from datetime import datetime, time
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from heapq import heappop, heappush
 
 import pytz
 from dateutil.relativedelta import relativedelta
 
 from odoo import _, api, fields, models
+from odoo.exceptions import UserError, ValidationError
+from odoo.osv import expression
+from odoo.osv.query import Query
+from odoo.tools.sql import create_index
+
+from .hr_task_perf_sample import profiled
+
+STATE_BATCH_SIZE = 1000
+TIMELINE_CHANNEL = "hr_planning_resources.timeline"
+# Fields used by the timeline item template and colors
+TIMELINE_FIELDS = [
+    "display_name",
+    "employee_id",
+    "date_start",
+    "date_end",
+    "allocated_hours",
+    "state",
+    "has_conflict",
+]
+# Changes of these fields are pushed to the open timelines
+TIMELINE_NOTIFY_FIELDS = set(TIMELINE_FIELDS) | {
+    "name",
+    "type",
+    "project_id",
+    "task_id",
+    "ticket_id",
+    "company_id",
+}
 
 TASK_TYPES = [
     ("task", _("Task")),
@@ -12,6 +43,24 @@ TASK_TYPES = [
 ]
 
 
+def _intervals_hours(intervals, stops, date_from, date_to):
+    """Return the hours of sorted ``(start, stop)`` intervals inside a range.
+
+    ``stops`` holds the stop of each interval, so that the first interval
+    ending after ``date_from`` is found by bisection. ``date_from`` and
+    ``date_to`` are naive UTC datetimes.
+    """
+    date_from = pytz.utc.localize(date_from)
+    date_to = pytz.utc.localize(date_to)
+    hours = 0.0
+    for index in range(bisect_right(stops, date_from), len(intervals)):
+        start, stop = intervals[index]
+        if start >= date_to:
+            break
+        hours += (min(stop, date_to) - max(start, date_from)).total_seconds() / 3600
+    return hours
+
+
 class HrTask(models.Model):
     _name = "hr.task"
     _description = "HR Planning Resource"
@@ -40,18 +89,28 @@ class HrTask(models.Model):
     employee_id = fields.Many2one(
         "hr.employee",
         required=True,
+        index=True,
         tracking=True,
         default=lambda self: self._get_default_employee(),
     )
     resource_id = fields.Many2one(
         "resource.resource", related="employee_id.resource_id"
     )
-    user_id = fields.Many2one("res.users", related="employee_id.user_id")
+    # Stored so that the "My Shifts" and "My Department" filters and the
+    # department grouping do not go through hr.employee
+    user_id = fields.Many2one(
+        "res.users", related="employee_id.user_id", store=True, index=True
+    )
     department_id = fields.Many2one(
         "hr.department",
         related="employee_id.department_id",
+        store=True,
+        index=True,
+    )
+    member_of_department = fields.Boolean(
+        compute="_compute_member_of_department",
+        search="_search_member_of_department",
     )
-    member_of_department = fields.Boolean(related="employee_id.member_of_department")
     company_id = fields.Many2one(
         "res.company",
         default=lambda self: self.env.user.company_id.id,
@@ -87,10 +146,20 @@ class HrTask(models.Model):
     task_id = fields.Many2one("project.task", string="Task")
     ticket_id = fields.Many2one("helpdesk.ticket", string="Ticket")
 
-    leave_warning = fields.Char(compute="_compute_leave_warning")
+    leave_warning = fields.Char(compute="_compute_leave_warning", store=True)
+    has_conflict = fields.Boolean(
+        compute="_compute_has_conflict",
+        help="The employee has another task at the same time",
+    )
 
     # Recurrency
     recurrency_id = fields.Many2one("hr.task.recurrency", string="Recurrency")
+    recurrence_date = fields.Datetime(
+        readonly=True,
+        copy=False,
+        help="Start of the occurrence in the recurrence rule, for occurrences "
+        "created from a virtual one",
+    )
     repeat = fields.Boolean(
         compute="_compute_repeat", inverse="_inverse_repeat", copy=True
     )
@@ -139,6 +208,121 @@ class HrTask(models.Model):
 
     is_recompute_forced = fields.Boolean(default=False, string="Recompute Forced?")
 
+    def init(self):
+        # Overlap lookups go through a range index, see _search_overlapping
+        create_index(
+            self._cr,
+            "hr_task_date_range_index",
+            self._table,
+            ["tsrange(date_start, date_end, '[]')"],
+            method="gist",
+        )
+        # Scans of _delete_task and cron_update_task_state
+        create_index(
+            self._cr,
+            "hr_task_recurrency_state_date_start_index",
+            self._table,
+            ["recurrency_id", "state", "date_start"],
+        )
+        create_index(
+            self._cr,
+            "hr_task_state_date_start_index",
+            self._table,
+            ["state", "date_start"],
+        )
+        create_index(
+            self._cr,
+            "hr_task_state_date_end_index",
+            self._table,
+            ["state", "date_end"],
+        )
+
+    @api.model
+    def _search_overlapping(self, employees, date_from, date_to, domain=None):
+        """
+        Search the tasks overlapping a period through the range index.
+
+        Args:
+            employees: hr.employee records to restrict the search to, or None
+                to search the tasks of every employee
+            date_from (datetime): Start of the period (naive UTC, included)
+            date_to (datetime): End of the period (naive UTC, included)
+            domain (list, optional): Extra domain the tasks must match
+
+        Returns:
+            recordset: Overlapping hr.task records
+        """
+        domain = list(domain or [])
+        if employees is not None:
+            domain = expression.AND([[("employee_id", "in", employees.ids)], domain])
+        self.flush_model(["date_start", "date_end"])
+        query = self._search(domain)
+        if not isinstance(query, Query):
+            # The domain can not match any record
+            return self.browse()
+        query.add_where(
+            f'tsrange("{self._table}"."date_start", "{self._table}"."date_end", \'[]\')'
+            " && tsrange(%s, %s, '[]')",
+            [date_from, date_to],
+        )
+        return self.browse(query)
+
+    @api.model
+    def get_timeline_data(self, domain, date_from=False, date_to=False, group_by=None):
+        """
+        Returns the compact rows drawn by the planning timeline.
+
+        Args:
+            domain (list): Domain of the timeline view
+            date_from (str, optional): Start of the window to load
+            date_to (str, optional): End of the window to load
+            group_by (list, optional): Fields the timeline is grouped by
+
+        Returns:
+            list: Dicts holding only the fields of the timeline item template
+        """
+        group_by = group_by or []
+        domain = list(domain or [])
+        if date_from and date_to:
+            tasks = self._search_overlapping(
+                None,
+                fields.Datetime.to_datetime(date_from),
+                fields.Datetime.to_datetime(date_to),
+                domain=domain,
+            )
+        else:
+            tasks = self.search(domain)
+        field_names = TIMELINE_FIELDS + [
+            field_name for field_name in group_by if field_name not in TIMELINE_FIELDS
+        ]
+        rows = tasks.read(field_names)
+        if date_from and date_to:
+            rows += self.env["hr.task.recurrency"]._get_virtual_timeline_rows(
+                domain,
+                fields.Datetime.to_datetime(date_from),
+                fields.Datetime.to_datetime(date_to),
+                field_names,
+            )
+        return rows
+
+    @api.model
+    def materialize_virtual_occurrences(self, virtual_ids):
+        """
+        Creates the tasks of virtual occurrences of recurrencies.
+
+        Args:
+            virtual_ids (list): Ids of virtual timeline rows
+
+        Returns:
+            list: Ids of the tasks, in the order of ``virtual_ids``
+        """
+        HrTaskRecurrency = self.env["hr.task.recurrency"]
+        task_ids = []
+        for virtual_id in virtual_ids:
+            recurrency, date_start = HrTaskRecurrency._parse_virtual_id(virtual_id)
+            task_ids.append(recurrency._materialize_occurrence(date_start).id)
+        return task_ids
+
     @api.onchange("filtered_project_id")
     def _onchange_filtered_project_id(self):
         res = {"domain": {"task_id": []}}
@@ -163,7 +347,8 @@ class HrTask(models.Model):
 
             start = pytz.utc.localize(date_start)
             end = pytz.utc.localize(date_end)
-            opening_hours = self._company_task_working_hours(start, end)
+            employee = self.env["hr.employee"].browse(res.get("employee_id"))
+            opening_hours = self._company_task_working_hours(start, end, employee)
             res["date_start"] = (
                 opening_hours[0].astimezone(pytz.utc).replace(tzinfo=None)
             )
@@ -175,20 +360,38 @@ class HrTask(models.Model):
 
         return res
 
-    def _company_task_working_hours(self, start, end):
+    def _company_task_working_hours(self, start, end, employee=None):
+        """
+        Narrows a period to the working hours it contains.
+
+        Args:
+            start (datetime): Aware start of the period
+            end (datetime): Aware end of the period
+            employee (optional): hr.employee record whose computed daily
+                capacity gives the working hours, the calendar of the company
+                being expanded when the capacity is missing
+
+        Returns:
+            tuple: Aware start and end
+        """
+        if employee and employee.resource_calendar_id:
+            opening_hours = self._get_capacity_working_hours(employee, start, end)
+            if opening_hours:
+                return opening_hours
         company = self.company_id or self.env.company
-        work_interval = company.resource_calendar_id._work_intervals_batch(start, end)[
-            False
-        ]
-        intervals = [
-            (date_start, date_stop) for date_start, date_stop, _ in work_interval
-        ]
+        calendar = company.resource_calendar_id
+        intervals = []
+        if calendar:
+            intervals = calendar._get_work_intervals(start, end)[False]
         date_start, date_end = (start, end)
         if intervals:
             if (date_end - date_start).days == 0:
+                # The intervals are in UTC, the day is the one of the calendar
+                tz = pytz.timezone(calendar.tz or "UTC")
                 date_start = intervals[0][0]
+                day = date_start.astimezone(tz).date()
                 date_end = [
-                    stop for _, stop in intervals if stop.date() == date_start.date()
+                    stop for _, stop in intervals if stop.astimezone(tz).date() == day
                 ][-1]
             else:
                 date_start = intervals[0][0]
@@ -196,6 +399,96 @@ class HrTask(models.Model):
 
         return (date_start, date_end)
 
+    def _get_capacity_working_hours(self, employee, start, end):
+        """
+        Narrows a period to the working hours of the daily capacity.
+
+        Returns:
+            tuple: Aware start and end, or None when the capacity of a day of
+            the period is not computed
+        """
+        tz = pytz.timezone(employee.tz or "UTC")
+        first_day = start.astimezone(tz).date()
+        last_day = end.astimezone(tz).date()
+        capacity = self.env["hr.employee.capacity"]._get_daily_capacity(
+            employee, first_day, last_day
+        )[employee.id]
+        if len(capacity) != (last_day - first_day).days + 1:
+            return None
+        naive_start = start.astimezone(pytz.utc).replace(tzinfo=None)
+        naive_end = end.astimezone(pytz.utc).replace(tzinfo=None)
+        bounds = [
+            (
+                max(day_capacity["work_start"], naive_start),
+                min(day_capacity["work_stop"], naive_end),
+            )
+            for _day, day_capacity in sorted(capacity.items())
+            if day_capacity["work_start"]
+            and day_capacity["work_start"] < naive_end
+            and day_capacity["work_stop"] > naive_start
+        ]
+        if not bounds:
+            return (start, end)
+        date_start = bounds[0][0]
+        # A period of less than a day ends with the first working day
+        date_end = bounds[0][1] if (end - start).days == 0 else bounds[-1][1]
+        return (pytz.utc.localize(date_start), pytz.utc.localize(date_end))
+
+    def _get_my_department_domain(self, negate=False):
+        """
+        Returns the domain of the tasks of the current user's department.
+
+        Args:
+            negate (bool, optional): Return the domain of the other tasks,
+                the tasks without department included
+
+        Note:
+            - Sub-departments are included, as in hr.employee
+            - Without department, only the tasks of the user's employee match
+        """
+        employee = self.env.user.employee_id
+        if not employee.department_id:
+            return [("employee_id", "!=" if negate else "=", employee.id)]
+        department_ids = self._get_my_department_ids()
+        if negate:
+            return [
+                "|",
+                ("department_id", "=", False),
+                ("department_id", "not in", department_ids),
+            ]
+        return [("department_id", "in", department_ids)]
+
+    def _get_my_department_ids(self):
+        """Returns the ids of the current user's department and its children."""
+        department = self.env.user.employee_id.department_id
+        if not department:
+            return []
+        return (
+            self.env["hr.department"]
+            .sudo()
+            .search([("id", "child_of", department.ids)])
+            .ids
+        )
+
+    @api.depends_context("uid")
+    @api.depends("department_id", "employee_id")
+    def _compute_member_of_department(self):
+        employee = self.env.user.employee_id
+        if employee.department_id:
+            department_ids = set(self._get_my_department_ids())
+            for task in self:
+                task.member_of_department = task.department_id.id in department_ids
+        else:
+            for task in self:
+                task.member_of_department = bool(employee) and (
+                    task.employee_id == employee
+                )
+
+    def _search_member_of_department(self, operator, value):
+        if operator not in ("=", "!=") or not isinstance(value, bool):
+            raise UserError(_("Operation not supported"))
+        return self._get_my_department_domain(negate=(operator == "=") != value)
+
     @api.depends("recurrency_id")
     def _compute_repeat(self):
         for task in self:
@@ -276,7 +569,18 @@ class HrTask(models.Model):
                 task.recurrency_id._delete_task(task.date_end)
                 task.recurrency_id.unlink()
 
-    @api.depends("date_start", "date_end", "employee_id")
+    @api.depends(
+        "date_start",
+        "date_end",
+        "employee_id",
+        # The message shows the employee, formatted in its language and timezone
+        "employee_id.name",
+        "employee_id.tz",
+        "employee_id.user_id.lang",
+        "employee_id.resource_calendar_id",
+        "employee_id.resource_calendar_id.tz",
+    )
+    @profiled
     def _compute_leave_warning(self):
         assigned_tasks = self.filtered(lambda s: s.employee_id and s.date_start)
         unassigned_tasks = self - assigned_tasks
@@ -289,29 +593,207 @@ class HrTask(models.Model):
         if not assigned_tasks:
             return
 
-        min_date = min(assigned_tasks.mapped("date_start"))
-        date_from = max(min_date, fields.Datetime.today())
+        date_from = min(assigned_tasks.mapped("date_start"))
         date_to = max(assigned_tasks.mapped("date_end"))
         employee_ids = assigned_tasks.mapped("employee_id")
 
-        leaves = self.env["hr.leave"]._get_leaves(
+        # The warning is stored, so it must not depend on the leaves that the
+        # current user is allowed to read
+        HrLeave = self.env["hr.leave"].sudo()
+        leaves = HrLeave._get_leaves(
             date_from=date_from,
             date_to=date_to,
             employee_ids=employee_ids,
         )
 
+        task_ids_by_employee = defaultdict(list)
         for task in assigned_tasks:
-            task_leaves = leaves.get(task.employee_id.id)
-            if task_leaves:
-                warning = self.env["hr.leave"]._get_leave_message_warning(
-                    leaves=task_leaves,
-                    employee=task.employee_id,
+            task_ids_by_employee[task.employee_id].append(task.id)
+
+        for employee, task_ids in task_ids_by_employee.items():
+            tasks = self.browse(task_ids)
+            employee_leaves = leaves.get(employee.id)
+            if not employee_leaves:
+                tasks.leave_warning = False
+                continue
+            # The work days of the employee are expanded once for all the tasks
+            work_days = tasks._get_work_days(employee)
+            formatted_periods = {}
+            # The stored message must read the same whoever triggers the
+            # recompute, so it is formatted for the employee
+            EmployeeHrLeave = HrLeave.with_context(
+                **self._get_leave_warning_context(employee)
+            )
+            for task in tasks:
+                task.leave_warning = EmployeeHrLeave._get_leave_message_warning(
+                    leaves=employee_leaves,
+                    employee=employee,
                     date_from=task.date_start,
                     date_to=task.date_end,
+                    work_times=work_days.get(task.id),
+                    formatted_periods=formatted_periods,
                 )
-                task.leave_warning = warning
-            else:
-                task.leave_warning = False
+
+    @api.model
+    def _get_leave_warning_context(self, employee):
+        """
+        Context the leave warning of an employee is formatted in.
+
+        Args:
+            employee: hr.employee record
+
+        Returns:
+            dict: Language of the employee's user, or of the company, and time
+            zone of the employee's resource, or of its working schedule
+        """
+        return {
+            "lang": employee.user_id.lang
+            or employee.company_id.partner_id.lang
+            or "en_US",
+            "tz": employee.tz or employee.resource_calendar_id.tz or "UTC",
+        }
+
+    def _get_work_days(self, employee):
+        """
+        Lists the days on which the employee works during each task.
+
+        The days are read from the daily capacity of the employee when it is
+        computed over the range of all the tasks. Otherwise the calendar is
+        expanded a single time over that range, then the intervals are
+        dispatched to the tasks they overlap.
+
+        Args:
+            employee: hr.employee record the tasks belong to
+
+        Returns:
+            dict: Set of local dates by task id, empty when the employee has no
+            working schedule
+        """
+        calendar = employee.resource_calendar_id
+        if not calendar or not self:
+            return {}
+        resource = employee.resource_id
+        tz = pytz.timezone(resource.tz or "UTC")
+        start = pytz.utc.localize(min(self.mapped("date_start")))
+        end = pytz.utc.localize(max(self.mapped("date_end")))
+
+        first_day = start.astimezone(tz).date()
+        last_day = end.astimezone(tz).date()
+        capacity = self.env["hr.employee.capacity"]._get_daily_capacity(
+            employee, first_day, last_day
+        )[employee.id]
+        if len(capacity) == (last_day - first_day).days + 1:
+            return {
+                task.id: {
+                    day
+                    for day, day_capacity in capacity.items()
+                    if day_capacity["available_hours"] > 0
+                    and day_capacity["work_start"] < task.date_end
+                    and day_capacity["work_stop"] > task.date_start
+                }
+                for task in self
+            }
+
+        intervals = calendar._get_work_intervals(start, end, resource)[resource.id]
+        stops = [stop for _start, stop in intervals]
+
+        work_days = {}
+        for task in self:
+            task_start = pytz.utc.localize(task.date_start)
+            task_end = pytz.utc.localize(task.date_end)
+            days = set()
+            index = bisect_right(stops, task_start)
+            while index < len(intervals) and intervals[index][0] < task_end:
+                days.add(max(intervals[index][0], task_start).astimezone(tz).date())
+                index += 1
+            work_days[task.id] = days
+        return work_days
+
+    @api.depends("date_start", "date_end", "employee_id", "state")
+    def _compute_has_conflict(self):
+        conflicting_ids = self._get_conflicting_task_ids()
+        for task in self:
+            task.has_conflict = task._origin.id in conflicting_ids
+
+    @api.constrains("date_start", "date_end", "employee_id", "state")
+    def _check_double_booking(self):
+        block = (
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("hr_planning_resources.block_double_booking")
+        )
+        if not block:
+            return
+        conflicting_ids = self._get_conflicting_task_ids()
+        conflicting_tasks = self.filtered(lambda t: t.id in conflicting_ids)
+        if conflicting_tasks:
+            raise ValidationError(
+                _("The following employees are already planned at that time: %s")
+                % ", ".join(conflicting_tasks.employee_id.mapped("name"))
+            )
+
+    def _get_conflicting_task_ids(self):
+        """Returns the ids of the tasks overlapping another task of their employee."""
+        tasks = self._origin.filtered(
+            lambda t: t.employee_id and t.date_start and t.date_end
+        )
+        if not tasks:
+            return set()
+        conflicts = self.find_conflicts(
+            tasks.employee_id.ids,
+            min(tasks.mapped("date_start")),
+            max(tasks.mapped("date_end")),
+        )
+        return {task_id for pair in conflicts for task_id in pair}
+
+    @api.model
+    def find_conflicts(self, employee_ids, date_from, date_to):
+        """
+        Finds the tasks overlapping each other for the same employee.
+
+        Args:
+            employee_ids (list): Ids of the employees to check
+            date_from (datetime): Start of the period to check (naive UTC)
+            date_to (datetime): End of the period to check (naive UTC)
+
+        Returns:
+            list: ``(task_id, other_task_id)`` pairs, the first task starting
+            first
+
+        Note:
+            - Cancelled tasks are ignored, and tasks only touching each other
+              do not conflict
+            - Each employee's tasks are sorted once by start, then swept while
+              the running tasks are kept in a heap by end: O(n log n + k) for
+              n tasks and k conflicts
+        """
+        tasks = self._search_overlapping(
+            self.env["hr.employee"].browse(employee_ids),
+            date_from,
+            date_to,
+            domain=[("state", "!=", "cancel")],
+        )
+        intervals_by_employee = defaultdict(list)
+        for task in tasks:
+            intervals_by_employee[task.employee_id.id].append(
+                (task.date_start, task.date_end, task.id)
+            )
+
+        conflicts = []
+        for intervals in intervals_by_employee.values():
+            intervals.sort()
+            running = []
+            for date_start, date_end, task_id in intervals:
+                while running and running[0][0] <= date_start:
+                    heappop(running)
+                conflicts += [(other_id, task_id) for _end, other_id in running]
+                heappush(running, (date_end, task_id))
+        return conflicts
+
+    def _recompute_leave_warning(self):
+        """Flag the tasks so their stored leave warning is computed again."""
+        if self:
+            self.env.add_to_compute(self._fields["leave_warning"], self)
 
     def _compute_title(self):
         for record in self:
@@ -339,6 +821,7 @@ class HrTask(models.Model):
         "employee_id.resource_calendar_id",
         "is_recompute_forced",
     )
+    @profiled
     def _compute_allocated_hours(self):
         """
         Compute working hours considering:
@@ -346,55 +829,231 @@ class HrTask(models.Model):
         - Approved time off (vacations, leaves)
         - Public holidays
         """
-        for record in self:
-            if not (record.date_start and record.date_end and record.employee_id):
-                record.allocated_hours = 0.0
-                continue
+        planned_tasks = self.filtered(
+            lambda t: t.date_start and t.date_end and t.employee_id
+        )
+        (self - planned_tasks).update({"allocated_hours": 0.0})
 
-            if record.is_recompute_forced:
-                total_seconds = (record.date_end - record.date_start).total_seconds()
-                record.allocated_hours = round(total_seconds / 3600.0, 2)
-                continue
+        forced_tasks = planned_tasks.filtered("is_recompute_forced")
+        for record in forced_tasks:
+            total_seconds = (record.date_end - record.date_start).total_seconds()
+            record.allocated_hours = round(total_seconds / 3600.0, 2)
 
-            # Normal calculation for non-forced records
-            calendar = (
-                record.employee_id.resource_calendar_id
-                or record.env.company.resource_calendar_id
+        # Normal calculation for non-forced records
+        tasks = planned_tasks - forced_tasks
+        no_calendar_tasks = tasks.filtered(
+            lambda t: not (
+                t.employee_id.resource_calendar_id or t.env.company.resource_calendar_id
             )
-            if not calendar:
-                record.allocated_hours = 0.0
+        )
+        no_calendar_tasks.update({"allocated_hours": 0.0})
+        tasks -= no_calendar_tasks
+
+        hours = self._get_work_hours_batch(
+            [(task.employee_id, task.date_start, task.date_end) for task in tasks]
+        )
+        for record, allocated_hours in zip(tasks, hours):
+            record.allocated_hours = allocated_hours
+
+    @api.model
+    def _get_work_hours_batch(self, slots):
+        """
+        Compute the working hours of many slots at once.
+
+        Args:
+            slots (list): ``(employee, date_start, date_end)`` tuples, with naive
+                UTC datetimes
+
+        Returns:
+            list: Working hours of each slot, in the same order
+
+        Note:
+            - The whole local days of the slots are read from the daily
+              capacity of the employees, with a single query
+            - The rest of the slots, and the days without computed capacity,
+              are intersected with the work intervals of the calendars
+        """
+        if not slots:
+            return []
+
+        employees = self.env["hr.employee"].union(*[slot[0] for slot in slots])
+        whole_days = [self._get_whole_days(*slot) for slot in slots]
+        days = [slot_days for slot_days in whole_days if slot_days]
+        daily_capacity = {}
+        if days:
+            daily_capacity = self.env["hr.employee.capacity"]._get_daily_capacity(
+                employees,
+                min(slot_days[0] for slot_days in days),
+                max(slot_days[1] for slot_days in days),
+            )
+
+        hours = [0.0] * len(slots)
+        windows = []
+        for index, (employee, date_start, date_end) in enumerate(slots):
+            slot_days = whole_days[index]
+            capacity = daily_capacity.get(employee.id, {})
+            if not slot_days:
+                windows.append((index, employee, date_start, date_end))
                 continue
+            first_day, last_day, whole_start, whole_end = slot_days
+            day_list = [
+                first_day + timedelta(days=offset)
+                for offset in range((last_day - first_day).days + 1)
+            ]
+            if not all(day in capacity for day in day_list):
+                windows.append((index, employee, date_start, date_end))
+                continue
+            hours[index] = sum(capacity[day]["available_hours"] for day in day_list)
+            if date_start < whole_start:
+                windows.append((index, employee, date_start, whole_start))
+            if whole_end < date_end:
+                windows.append((index, employee, whole_end, date_end))
+
+        window_hours = self._get_calendar_hours_batch(
+            [window[1:] for window in windows]
+        )
+        for window, window_hour in zip(windows, window_hours):
+            hours[window[0]] += window_hour
+        return hours
+
+    @api.model
+    def _get_whole_days(self, employee, date_start, date_end):
+        """
+        Finds the local days of the employee fully covered by a slot.
+
+        Returns:
+            tuple: First and last day, and the naive UTC start and end of the
+            covered days, or None when the slot covers no whole day
+        """
+        tz = pytz.timezone(employee.tz or "UTC")
+        local_start = pytz.utc.localize(date_start).astimezone(tz)
+        local_end = pytz.utc.localize(date_end).astimezone(tz)
+        first_day = local_start.date()
+        if local_start.time() != time.min:
+            first_day += timedelta(days=1)
+        last_day = local_end.date()
+        # Datetimes are stored to the second, 23:59:59 ends the day
+        if local_end.time() < time(23, 59, 59):
+            last_day -= timedelta(days=1)
+        if first_day > last_day:
+            return None
+
+        def to_utc(day):
+            return (
+                tz.localize(datetime.combine(day, time.min))
+                .astimezone(pytz.utc)
+                .replace(tzinfo=None)
+            )
+
+        whole_end = min(to_utc(last_day + timedelta(days=1)), date_end)
+        return first_day, last_day, to_utc(first_day), whole_end
+
+    @api.model
+    def _get_calendar_hours_batch(self, slots):
+        """
+        Compute the working hours of slots from the calendars of the employees.
+
+        Args:
+            slots (list): ``(employee, date_start, date_end)`` tuples, with naive
+                UTC datetimes
+
+        Returns:
+            list: Working hours of each slot, in the same order
 
-            # Get base working hours without considering leaves
-            work_days_data = record.employee_id._get_work_days_data_batch(
-                record.date_start, record.date_end
-            )[record.employee_id.id]
-            base_hours = work_days_data["hours"]
+        Note:
+            - Slots less than a day apart are grouped, and the calendars are
+              expanded once per group over its range
+            - Validated time off is fetched with a single query for all slots
+            - Hours are obtained by intersecting each slot with the intervals
+        """
+        if not slots:
+            return []
 
-            # Get leaves (including vacations)
-            domain = [
-                ("employee_id", "=", record.employee_id.id),
+        employees = self.env["hr.employee"].union(*[slot[0] for slot in slots])
+        date_from = min(slot[1] for slot in slots)
+        date_to = max(slot[2] for slot in slots)
+        leaves_by_employee = defaultdict(list)
+        leaves = self.env["hr.leave"].search(
+            [
+                ("employee_id", "in", employees.ids),
                 ("state", "=", "validate"),
-                ("date_from", "<=", record.date_end),
-                ("date_to", ">=", record.date_start),
+                ("date_from", "<=", date_to),
+                ("date_to", ">=", date_from),
             ]
-            leaves = record.env["hr.leave"].search(domain)
+        )
+        for leave in leaves:
+            leaves_by_employee[leave.employee_id.id].append(leave)
+
+        groups = []
+        for index in sorted(range(len(slots)), key=lambda i: slots[i][1]):
+            if groups and slots[index][1] <= groups[-1][1] + timedelta(days=1):
+                groups[-1][0].append(index)
+                groups[-1][1] = max(groups[-1][1], slots[index][2])
+            else:
+                groups.append([[index], slots[index][2]])
+
+        result = [0.0] * len(slots)
+        for indexes, group_end in groups:
+            group_slots = [slots[index] for index in indexes]
+            work_intervals = self._get_work_intervals_batch(
+                self.env["hr.employee"].union(*[slot[0] for slot in group_slots]),
+                group_slots[0][1],
+                group_end,
+            )
+            stops_by_employee = {
+                employee_id: [stop for _start, stop in intervals]
+                for employee_id, intervals in work_intervals.items()
+            }
+            for index, (employee, date_start, date_end) in zip(indexes, group_slots):
+                intervals = work_intervals[employee.id]
+                stops = stops_by_employee[employee.id]
+                base_hours = _intervals_hours(intervals, stops, date_start, date_end)
+
+                # Calculate leave hours on the overlapping period of each time off
+                leave_hours = 0
+                for leave in leaves_by_employee[employee.id]:
+                    if leave.date_from > date_end or leave.date_to < date_start:
+                        continue
+                    leave_hours += _intervals_hours(
+                        intervals,
+                        stops,
+                        max(leave.date_from, date_start),
+                        min(leave.date_to, date_end),
+                    )
+
+                # Subtract leave hours from base hours
+                result[index] = max(0, base_hours - leave_hours)
+        return result
 
-            # Calculate leave hours
-            leave_hours = 0
-            for leave in leaves:
-                # Get overlapping period
-                leave_start = max(leave.date_from, record.date_start)
-                leave_end = min(leave.date_to, record.date_end)
+    @api.model
+    def _get_work_intervals_batch(self, employees, date_from, date_to):
+        """
+        Expand the work intervals of the employees, time off excluded.
+
+        Employees are grouped by calendar so that each calendar is expanded a
+        single time between ``date_from`` and ``date_to`` (naive UTC), through
+        the cache of resource.calendar._get_work_intervals.
 
-                # Calculate leave hours for the overlapping period
-                leave_days_data = record.employee_id._get_work_days_data_batch(
-                    leave_start, leave_end
-                )[record.employee_id.id]
-                leave_hours += leave_days_data["hours"]
+        Returns:
+            dict: Sorted ``(start, stop)`` aware datetimes by employee id
+        """
+        start = pytz.utc.localize(date_from)
+        end = pytz.utc.localize(date_to)
+        employees_by_calendar = defaultdict(lambda: self.env["hr.employee"])
+        for employee in employees:
+            employees_by_calendar[employee.resource_calendar_id] |= employee
 
-            # Subtract leave hours from base hours
-            record.allocated_hours = max(0, base_hours - leave_hours)
+        result = {}
+        for calendar, calendar_employees in employees_by_calendar.items():
+            if not calendar:
+                result.update(dict.fromkeys(calendar_employees.ids, []))
+                continue
+            intervals = calendar._get_work_intervals(
+                start, end, resources=calendar_employees.resource_id
+            )
+            for employee in calendar_employees:
+                result[employee.id] = intervals[employee.resource_id.id]
+        return result
 
     def _get_tz(self):
         return (
@@ -424,8 +1083,31 @@ class HrTask(models.Model):
         elif self.type == "ticket":
             self.write({"project_id": False, "task_id": False})
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        tasks = super().create(vals_list)
+        self._recompute_hr_task_counters(tasks._get_hr_task_counter_records())
+        tasks._schedule_state_update()
+        tasks._notify_timeline("create")
+        return tasks
+
     def write(self, values):
+        counter_records = self._get_hr_task_counter_records(values)
+        # Timelines of the company the tasks leave must drop them
+        previous_company_ids = (
+            {task.id: task.company_id.id for task in self.sudo()}
+            if "company_id" in values
+            else None
+        )
         result = super().write(values)
+        if counter_records:
+            self._recompute_hr_task_counters(
+                counter_records + self._get_hr_task_counter_records(values)
+            )
+        if {"state", "date_start", "date_end"}.intersection(values):
+            self._schedule_state_update()
+        if TIMELINE_NOTIFY_FIELDS.intersection(values):
+            self._notify_timeline("write", previous_company_ids)
         if any(
             key
             in (
@@ -473,20 +1155,83 @@ class HrTask(models.Model):
                         "repeat_type": repeat_type,
                         "company_id": task.company_id.id,
                     }
+                    generated_dates = task.recurrency_id._get_generated_dates(task)
                     task.recurrency_id.write(recurrency_values)
-                    if task.repeat_type == "x_times":
-                        recurrency_values[
-                            "repeat_until"
-                        ] = task.recurrency_id._get_recurrence_last_datetime()
-                    date_end = (
-                        task.date_end
-                        if values.get("repeat_unit")
-                        else recurrency_values.get("repeat_until")
-                    )
-                    task.recurrency_id._delete_task(date_end)
-                    task.recurrency_id._repeat_task()
+                    task.recurrency_id._replan_task(task, generated_dates)
+        return result
+
+    def unlink(self):
+        counter_records = self._get_hr_task_counter_records()
+        notifications = self._get_timeline_notifications("unlink")
+        result = super().unlink()
+        self._recompute_hr_task_counters(counter_records)
+        if notifications:
+            self.env["bus.bus"]._sendmany(notifications)
         return result
 
+    def _get_timeline_notifications(self, event, previous_company_ids=None):
+        """
+        Returns the bus notifications describing a change of the tasks.
+
+        One compact message with the ids of the changed tasks is sent on the
+        planning channel of each company. Open timelines read the rows again
+        themselves, so access rights keep applying.
+
+        Args:
+            event (str): "create", "write" or "unlink"
+            previous_company_ids (dict, optional): Company id of each task
+                before the change, whose channel is notified as well
+        """
+        previous_company_ids = previous_company_ids or {}
+        task_ids_by_company = defaultdict(list)
+        for task in self.sudo():
+            company_ids = {task.company_id.id}
+            if task.id in previous_company_ids:
+                company_ids.add(previous_company_ids[task.id])
+            for company_id in company_ids:
+                task_ids_by_company[company_id].append(task.id)
+        return [
+            (
+                f"{TIMELINE_CHANNEL}_{company_id}",
+                "hr_task_changed",
+                {"event": event, "ids": task_ids},
+            )
+            for company_id, task_ids in task_ids_by_company.items()
+        ]
+
+    def _notify_timeline(self, event, previous_company_ids=None):
+        """Publishes the change of the tasks to the open planning timelines."""
+        notifications = self._get_timeline_notifications(event, previous_company_ids)
+        if notifications:
+            self.env["bus.bus"]._sendmany(notifications)
+
+    def _get_hr_task_counter_records(self, field_names=None):
+        """
+        Return the records linked to the tasks whose model stores
+        ``hr_task_count`` (see hr.task.mixin), one recordset per field.
+
+        Args:
+            field_names (iterable, optional): Only consider these fields
+        """
+        records_list = []
+        for name, field in self._fields.items():
+            if field.type != "many2one" or (
+                field_names is not None and name not in field_names
+            ):
+                continue
+            Model = self.env[field.comodel_name]
+            if getattr(Model, "_hr_task_field", None) != name:
+                continue
+            if Model._fields["hr_task_count"].store:
+                records_list.append(self.sudo().mapped(name))
+        return records_list
+
+    @api.model
+    def _recompute_hr_task_counters(self, records_list):
+        for records in records_list:
+            if records:
+                self.env.add_to_compute(records._fields["hr_task_count"], records)
+
     def action_cancel(self):
         self.write({"state": "cancel"})
         return True
@@ -503,17 +1248,58 @@ class HrTask(models.Model):
         self.write({"state": "finished"})
         return True
 
+    @profiled
     def cron_update_task_state(self):
-        self.search(
-            [
-                ("date_end", "<", fields.Datetime.now()),
-                ("state", "=", "in_progress"),
-            ]
-        ).write({"state": "finished"})
+        """
+        Applies the state transitions whose date has passed, then triggers the
+        cron again at the next start or end of a task.
+        """
+        now = fields.Datetime.now()
+        HrTask = self.with_context(hr_task_skip_state_schedule=True)
+        HrTask._apply_state_transition(
+            [("date_end", "<", now), ("state", "=", "in_progress")], "finished"
+        )
+        HrTask._apply_state_transition(
+            [("date_start", "<=", now), ("state", "=", "planified")], "in_progress"
+        )
 
-        self.search(
-            [
-                ("date_start", "<=", fields.Datetime.now()),
-                ("state", "=", "planified"),
-            ]
-        ).write({"state": "in_progress"})
+        next_start = self.search(
+            [("date_start", ">", now), ("state", "=", "planified")],
+            order="date_start",
+            limit=1,
+        )
+        next_end = self.search(
+            [("date_end", ">=", now), ("state", "=", "in_progress")],
+            order="date_end",
+            limit=1,
+        )
+        (next_start | next_end)._schedule_state_update()
+
+    @api.model
+    def _apply_state_transition(self, domain, state):
+        """Writes ``state`` on the tasks matching ``domain``, batch by batch."""
+        while True:
+            tasks = self.search(domain, order="id", limit=STATE_BATCH_SIZE)
+            if not tasks:
+                break
+            tasks.write({"state": state})
+
+    def _get_state_boundary(self):
+        """Returns the datetime at which the task changes of state, if any."""
+        self.ensure_one()
+        if self.state == "planified":
+            return self.date_start
+        if self.state == "in_progress":
+            # Tasks are finished once their end is strictly in the past
+            return self.date_end + timedelta(seconds=1)
+        return False
+
+    def _schedule_state_update(self):
+        """Triggers the state cron at the nearest state change of the tasks."""
+        if self.env.context.get("hr_task_skip_state_schedule"):
+            return
+        boundaries = [task._get_state_boundary() for task in self]
+        boundaries = [boundary for boundary in boundaries if boundary]
+        cron = self.env.ref("hr_planning_resources.ir_cron_hr_task", False)
+        if boundaries and cron:
+            cron.sudo()._trigger(max(min(boundaries), fields.Datetime.now()))
@@ -0,0 +1,136 @@
+import logging
+import threading
+from datetime import timedelta
+
+from psycopg2 import sql
+
+from odoo import api, fields, models
+
+from .hr_task import TASK_TYPES
+
+ARCHIVED_STATES = ("finished", "cancel")
+# Columns copied from hr_task, the access log columns included
+ARCHIVE_COLUMNS = [
+    "name",
+    "type",
+    "state",
+    "employee_id",
+    "company_id",
+    "project_id",
+    "task_id",
+    "ticket_id",
+    "recurrency_id",
+    "date_start",
+    "date_end",
+    "allocated_hours",
+    "create_uid",
+    "create_date",
+    "write_uid",
+    "write_date",
+]
+_logger = logging.getLogger(__name__)
+
+
+class HrTaskArchive(models.Model):
+    _name = "hr.task.archive"
+    _description = "Archived HR Planning Resource"
+    _order = "date_start desc, id desc"
+
+    name = fields.Char(readonly=True)
+    type = fields.Selection(selection=TASK_TYPES, readonly=True)
+    state = fields.Selection(
+        [("finished", "Finished"), ("cancel", "Cancelled")], readonly=True
+    )
+    employee_id = fields.Many2one("hr.employee", readonly=True, index=True)
+    company_id = fields.Many2one("res.company", readonly=True)
+    project_id = fields.Many2one("project.project", readonly=True)
+    task_id = fields.Many2one("project.task", readonly=True)
+    ticket_id = fields.Many2one("helpdesk.ticket", readonly=True)
+    recurrency_id = fields.Many2one(
+        "hr.task.recurrency", readonly=True, ondelete="set null"
+    )
+    date_start = fields.Datetime(readonly=True, index=True)
+    date_end = fields.Datetime(readonly=True)
+    allocated_hours = fields.Float(readonly=True)
+    origin_id = fields.Integer(
+        readonly=True, help="Identifier of the planning task before its archival"
+    )
+
+    @api.model
+    def _get_archivable_domain(self, date_limit):
+        """
+        Returns the domain of the tasks to archive.
+
+        Note:
+            - Tasks of recurrencies with a number of repetitions stay, as
+              their first task is used to compute the end of the recurrency
+            - The anchor tasks of virtual recurrencies stay, as their
+              occurrences are computed from them
+        """
+        anchor_tasks = (
+            self.env["hr.task.recurrency"]
+            .sudo()
+            .search([("repeat_type", "=", "forever")])
+            ._get_virtual_recurrencies()
+            ._get_anchor_tasks()
+        )
+        return [
+            ("state", "in", ARCHIVED_STATES),
+            ("date_end", "<", date_limit),
+            ("id", "not in", [task.id for task in anchor_tasks.values()]),
+            "|",
+            ("recurrency_id", "=", False),
+            ("recurrency_id.repeat_type", "!=", "x_times"),
+        ]
+
+    @api.model
+    def _archive_tasks(self, tasks):
+        """
+        Copies the tasks to the archive table and deletes them.
+
+        The rows are copied with a single INSERT ... SELECT, the deletion goes
+        through the ORM so that messages, followers and counters are cleaned.
+        """
+        if not tasks:
+            return
+        tasks.flush_recordset()
+        columns = sql.SQL(", ").join(map(sql.Identifier, ARCHIVE_COLUMNS))
+        query = sql.SQL(
+            """
+            INSERT INTO hr_task_archive ({columns}, origin_id)
+            SELECT {columns}, id FROM hr_task WHERE id IN %s
+            """
+        ).format(columns=columns)
+        self.env.cr.execute(query, [tuple(tasks.ids)])
+        tasks.unlink()
+
+    @api.model
+    def _cron_archive(self):
+        """
+        Moves the old finished and cancelled tasks to the archive.
+
+        Note:
+            - The age in days is read from the
+              ``hr_planning_resources.archive_age_days`` system parameter
+            - The tasks are archived and committed in batches
+        """
+        ICP = self.env["ir.config_parameter"].sudo()
+        age = int(ICP.get_param("hr_planning_resources.archive_age_days", 365))
+        batch_size = int(
+            ICP.get_param("hr_planning_resources.archive_batch_size", 1000)
+        )
+        auto_commit = not getattr(threading.current_thread(), "testing", False)
+        domain = self._get_archivable_domain(
+            fields.Datetime.now() - timedelta(days=age)
+        )
+        HrTask = self.env["hr.task"].sudo()
+        archived_count = 0
+        while True:
+            tasks = HrTask.search(domain, order="id", limit=batch_size)
+            self._archive_tasks(tasks)
+            archived_count += len(tasks)
+            if len(tasks) < batch_size:
+                break
+            if auto_commit:
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+        _logger.info("%s planning tasks archived", archived_count)
@@ -0,0 +1,66 @@
+from odoo import fields, models, tools
+
+from .hr_task import TASK_TYPES
+
+
+class HrTaskHistory(models.Model):
+    _name = "hr.task.history"
+    _description = "HR Planning History"
+    _auto = False
+    _order = "date_start desc"
+
+    name = fields.Char(readonly=True)
+    type = fields.Selection(selection=TASK_TYPES, readonly=True)
+    state = fields.Selection(
+        [
+            ("planified", "Planified"),
+            ("in_progress", "In Progress"),
+            ("finished", "Finished"),
+            ("cancel", "Cancelled"),
+        ],
+        readonly=True,
+    )
+    employee_id = fields.Many2one("hr.employee", readonly=True)
+    department_id = fields.Many2one("hr.department", readonly=True)
+    company_id = fields.Many2one("res.company", readonly=True)
+    project_id = fields.Many2one("project.project", readonly=True)
+    task_id = fields.Many2one("project.task", readonly=True)
+    ticket_id = fields.Many2one("helpdesk.ticket", readonly=True)
+    date_start = fields.Datetime(readonly=True)
+    date_end = fields.Datetime(readonly=True)
+    allocated_hours = fields.Float(readonly=True)
+    is_archived = fields.Boolean(readonly=True)
+
+    def _select_tasks(self, table, is_archived):
+        # Even ids are the planning tasks, odd ones the archived tasks
+        return f"""
+            SELECT
+                t.id * 2 + {int(is_archived)} AS id,
+                t.name,
+                t.type,
+                t.state,
+                t.employee_id,
+                e.department_id,
+                t.company_id,
+                t.project_id,
+                t.task_id,
+                t.ticket_id,
+                t.date_start,
+                t.date_end,
+                t.allocated_hours,
+                {is_archived} AS is_archived
+            FROM {table} t
+            LEFT JOIN hr_employee e ON e.id = t.employee_id
+        """
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(  # pylint: disable=sql-injection
+            f"""
+            CREATE OR REPLACE VIEW {self._table} AS (
+                {self._select_tasks("hr_task", False)}
+                UNION ALL
+                {self._select_tasks("hr_task_archive", True)}
+            )
+            """
+        )
@@ -5,29 +5,39 @@ class HrTaskMixin(models.AbstractModel):
     _name = "hr.task.mixin"
     _description = "HR Task Mixin"
 
+    # Name of the hr.task field linking the tasks to the concrete model
+    _hr_task_field = None
+
     hr_task_count = fields.Integer(
         compute="_compute_hr_task_count", string="HR Task Count"
     )
 
     def _compute_hr_task_count(self):
         """
-        Compute the number of HR tasks related to this record.
-        Should be implemented by concrete models that inherit this mixin.
+        Compute the number of HR tasks related to the records with a single
+        grouped query on the hr.task field named by ``_hr_task_field``.
+
+        Concrete models may redefine ``hr_task_count`` with ``store=True``:
+        hr.task then flags the counter for recompute whenever its tasks are
+        created, relinked or deleted.
         """
-        raise NotImplementedError(
-            _("The method _compute_hr_task_count must be implemented in the subclass.")
+        if not self._hr_task_field:
+            raise NotImplementedError(
+                _("The attribute _hr_task_field must be set in the subclass.")
+            )
+        field_name = self._hr_task_field
+        task_data = self.env["hr.task"]._read_group(
+            [(field_name, "in", self._origin.ids)], [field_name], [field_name]
         )
+        counts = {
+            data[field_name][0]: data[f"{field_name}_count"] for data in task_data
+        }
+        for record in self:
+            record.hr_task_count = counts.get(record._origin.id, 0)
 
     def action_view_hr_task(self):
         self.ensure_one()
 
-        # Determine the domain based on the model type
-        domain_map = {
-            "project.project": [("project_id", "=", self.id)],
-            "helpdesk.ticket": [("ticket_id", "=", self.id)],
-        }
-        domain = domain_map.get(self._name, [("task_id", "=", self.id)])
-
         # Prepare and return the action to view the HR tasks
         return {
             "type": "ir.actions.act_window",
@@ -35,20 +45,18 @@ class HrTaskMixin(models.AbstractModel):
             "view_mode": "tree,form",
             "views": [[False, "tree"], [False, "form"]],
             "context": dict(self.env.context),
-            "domain": domain,
+            "domain": [(self._hr_task_field, "=", self.id)],
         }
 
     def action_create_hr_task(self):
-        self.ensure_one()
-
         # Fetch the form view for creating HR tasks
         view_id = self.env.ref("hr_planning_resources.create_hr_task_view_form").id
 
-        # Update context with default resource model and default resource ID
+        # Update context with default resource model and default resource IDs
         ctx = dict(
             self.env.context,
             default_res_model=self._name,
-            default_res_id=self.id,
+            default_res_ids=self.ids,
         )
 
         # Return the action to open the create HR task form
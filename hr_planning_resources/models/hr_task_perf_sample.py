@@ -0,0 +1,106 @@
+import functools
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+PROFILING_PARAM = "hr_planning_resources.profiling"
+RETENTION_PARAM = "hr_planning_resources.profiling_retention_days"
+_logger = logging.getLogger(__name__)
+# Samples of the profiled calls running in the current thread
+_profiling = threading.local()
+
+
+def profiled(method):
+    """
+    Measures the calls of a method when profiling is enabled.
+
+    The ``hr_planning_resources.profiling`` system parameter switches it on:
+    ``log`` writes one log line per call and ``db`` stores an
+    hr.task.perf.sample. Put it below ``api`` decorators.
+
+    Only the calls that succeed are recorded. The samples of nested calls are
+    recorded once the outermost call returns, so that storing them does not
+    count in the queries of the calls around them.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        mode = self.env["ir.config_parameter"].sudo().get_param(PROFILING_PARAM)
+        if mode not in ("log", "db"):
+            return method(self, *args, **kwargs)
+        samples = getattr(_profiling, "samples", None)
+        outermost = samples is None
+        if outermost:
+            samples = _profiling.samples = []
+        try:
+            sql_count = self.env.cr.sql_log_count
+            started = time.perf_counter()
+            result = method(self, *args, **kwargs)
+            samples.append(
+                {
+                    "name": method.__name__,
+                    "res_model": self._name,
+                    "record_count": len(self),
+                    "duration": time.perf_counter() - started,
+                    "query_count": self.env.cr.sql_log_count - sql_count,
+                }
+            )
+        finally:
+            if outermost:
+                _profiling.samples = None
+        if outermost:
+            self.env["hr.task.perf.sample"]._record(mode, samples)
+        return result
+
+    return wrapper
+
+
+class HrTaskPerfSample(models.Model):
+    _name = "hr.task.perf.sample"
+    _description = "HR Task Performance Sample"
+    _order = "id desc"
+
+    name = fields.Char(string="Method", required=True, readonly=True, index=True)
+    res_model = fields.Char(string="Model", required=True, readonly=True)
+    record_count = fields.Integer(readonly=True, group_operator="sum")
+    duration = fields.Float(
+        string="Duration (s)", digits=(16, 4), readonly=True, group_operator="sum"
+    )
+    query_count = fields.Integer(readonly=True, group_operator="sum")
+
+    @api.model
+    def _record(self, mode, samples):
+        """
+        Logs or stores the samples of profiled calls.
+
+        Args:
+            mode (str): ``log`` or ``db``
+            samples (list): Dicts with the name of the profiled method, the
+                model and number of records it was called on, its wall time in
+                seconds and its number of SQL queries
+        """
+        if mode == "log":
+            for sample in samples:
+                _logger.info(
+                    "Profiled %s.%s: %d records, %.4f s, %d queries",
+                    sample["res_model"],
+                    sample["name"],
+                    sample["record_count"],
+                    sample["duration"],
+                    sample["query_count"],
+                )
+            return
+        self.sudo().create(samples)
+
+    @api.autovacuum
+    def _gc_samples(self):
+        """Deletes the samples older than the retention period."""
+        days = int(
+            self.env["ir.config_parameter"].sudo().get_param(RETENTION_PARAM, 30)
+        )
+        self.sudo().search(
+            [("create_date", "<", fields.Datetime.now() - timedelta(days=days))]
+        ).unlink()
@@ -1,10 +1,26 @@
 import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import islice
+
+import pytz
 
 from odoo import _, api, fields, models
 from odoo.exceptions import ValidationError
+from odoo.osv import expression
 from odoo.tools.date_utils import get_timedelta
 
+from .hr_task_perf_sample import profiled
+
 TASK_GENERATION_INTERVAL = 1
+SCHEDULE_CHUNK_SIZE = 50
+MAX_OCCURRENCES = 365 * 5  # 5 years limit
+SCHEDULE_CYCLE_PARAM = "hr_planning_resources.schedule_cycle_start"
+VIRTUAL_OCCURRENCES_PARAM = "hr_planning_resources.virtual_occurrences"
+VIRTUAL_ID_PREFIX = "virtual"
+VIRTUAL_ID_DATE_FORMAT = "%Y%m%d%H%M%S"
 _logger = logging.getLogger(__name__)
 
 
@@ -46,6 +62,11 @@ class HrTaskRecurrency(models.Model):
     last_generated_end_datetime = fields.Datetime(
         "Last Generated End Date", readonly=True
     )
+    last_schedule_datetime = fields.Datetime(
+        "Last Scheduled",
+        readonly=True,
+        help="Start of the last generation cycle that processed this recurrency",
+    )
     company_id = fields.Many2one(
         "res.company",
         string="Company",
@@ -84,25 +105,84 @@ class HrTaskRecurrency(models.Model):
         return result
 
     @api.model
+    @profiled
     def _cron_schedule_next(self):
-        companies = self.env["res.company"].search([])
-        now = fields.Datetime.now()
-        for company in companies:
-            delta = get_timedelta(TASK_GENERATION_INTERVAL, "month")
-
-            recurrencies = self.search(
-                [
-                    "&",
-                    "&",
-                    ("company_id", "=", company.id),
-                    ("last_generated_end_datetime", "<", now + delta),
-                    "|",
-                    ("repeat_until", "=", False),
-                    ("repeat_until", ">", now - delta),
-                ]
+        """
+        Generates the next tasks of the recurrencies of every company.
+
+        Note:
+            - Recurrencies are fetched by id in chunks across all companies,
+              and each chunk is committed once processed
+            - Processed recurrencies are marked with the start of the current
+              cycle, so a run stopped by its time budget or by a crash is
+              resumed by the next one
+            - When the time budget is spent, the cron is triggered again
+        """
+        ICP = self.env["ir.config_parameter"].sudo()
+        try:
+            chunk_size = int(
+                ICP.get_param(
+                    "hr_planning_resources.schedule_chunk_size", SCHEDULE_CHUNK_SIZE
+                )
             )
+        except ValueError:
+            chunk_size = SCHEDULE_CHUNK_SIZE
+        # A chunk without limit would never end the loop below
+        if chunk_size < 1:
+            _logger.warning(
+                "Invalid chunk size %s for the recurring tasks generation, "
+                "using %s.",
+                chunk_size,
+                SCHEDULE_CHUNK_SIZE,
+            )
+            chunk_size = SCHEDULE_CHUNK_SIZE
+        time_budget = float(
+            ICP.get_param("hr_planning_resources.schedule_time_budget", 300)
+        )
+        cycle_start = ICP.get_param(SCHEDULE_CYCLE_PARAM)
+        if not cycle_start:
+            cycle_start = fields.Datetime.to_string(fields.Datetime.now())
+            ICP.set_param(SCHEDULE_CYCLE_PARAM, cycle_start)
+        cycle_start = fields.Datetime.to_datetime(cycle_start)
+
+        auto_commit = not getattr(threading.current_thread(), "testing", False)
+        started = time.monotonic()
+        now = fields.Datetime.now()
+        delta = get_timedelta(TASK_GENERATION_INTERVAL, "month")
+        domain = [
+            # Recurrencies created with virtual occurrences generated nothing yet
+            "|",
+            ("last_generated_end_datetime", "=", False),
+            ("last_generated_end_datetime", "<", now + delta),
+            "|",
+            ("repeat_until", "=", False),
+            ("repeat_until", ">", now - delta),
+            "|",
+            ("last_schedule_datetime", "=", False),
+            ("last_schedule_datetime", "<", cycle_start),
+        ]
+        if self._virtual_occurrences_enabled():
+            domain.append(("repeat_type", "!=", "forever"))
+        while True:
+            recurrencies = self.search(domain, order="id", limit=chunk_size)
             recurrencies._repeat_task(now + delta)
+            recurrencies.exists().write({"last_schedule_datetime": cycle_start})
+            if len(recurrencies) < chunk_size:
+                break
+            if auto_commit:
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+            if time.monotonic() - started > time_budget:
+                _logger.info(
+                    "Time budget of the recurring tasks generation spent, "
+                    "the remaining recurrencies will be processed by the next run."
+                )
+                self.env.ref(
+                    "hr_planning_resources.ir_cron_hr_task_schedule"
+                )._trigger()
+                return
+        ICP.set_param(SCHEDULE_CYCLE_PARAM, False)
 
+    @profiled
     def _repeat_task(self, stop_datetime=False):
         """
         Repeats tasks based on recurrency settings.
@@ -117,14 +197,21 @@ class HrTaskRecurrency(models.Model):
             - Creates new tasks based on the latest task template
             - Updates last generated datetime
             - Removes recurrency if no template task exists
+            - The templates are fetched and the tasks of all the recurrencies
+              are created in batch
+            - When the batch fails, the tasks are created again recurrency by
+              recurrency, so that one failing recurrency does not block the
+              others
+            - Nothing is created for recurrencies with virtual occurrences
         """
-        HrTask = self.env["hr.task"]
-        created_task_ids = []
+        latest_tasks = self._get_latest_tasks()
+        values_by_recurrency = {}
 
-        for recurrency in self:
+        # Forever recurrencies only have virtual occurrences when enabled
+        for recurrency in self - self._get_virtual_recurrencies():
             try:
                 # Get template task
-                template_task = self._get_latest_task(recurrency)
+                template_task = latest_tasks.get(recurrency.id)
                 if not template_task:
                     _logger.info(
                         "No template task found for recurrency %s. "
@@ -139,13 +226,15 @@ class HrTaskRecurrency(models.Model):
                 if not date_limits:
                     continue
 
-                # Generate new tasks
-                new_tasks = self._create_recurring_tasks(
-                    template_task, recurrency, date_limits, HrTask
+                # Generate the values of the new tasks
+                values_list = self._generate_task_values_list(
+                    template_task,
+                    recurrency,
+                    date_limits["range_limit"],
+                    date_limits["task_duration"],
                 )
-
-                if new_tasks:
-                    created_task_ids.extend(new_tasks.ids)
+                if values_list:
+                    values_by_recurrency[recurrency] = values_list
 
             except Exception as e:
                 _logger.error(
@@ -155,7 +244,59 @@ class HrTaskRecurrency(models.Model):
                     exc_info=True,
                 )
 
-        return created_task_ids
+        if not values_by_recurrency:
+            return []
+
+        try:
+            with self.env.cr.savepoint():
+                return self._create_recurring_tasks(values_by_recurrency).ids
+        except Exception as e:
+            _logger.warning(
+                "Batch generation of recurring tasks failed, "
+                "retrying recurrency by recurrency: %s",
+                str(e),
+            )
+
+        new_tasks = self.env["hr.task"]
+        for recurrency, values_list in values_by_recurrency.items():
+            try:
+                with self.env.cr.savepoint():
+                    new_tasks |= self._create_recurring_tasks({recurrency: values_list})
+            except Exception as e:
+                _logger.error(
+                    "Error creating the tasks of recurrency %s: %s",
+                    recurrency.id,
+                    str(e),
+                    exc_info=True,
+                )
+        return new_tasks.ids
+
+    def _create_recurring_tasks(self, values_by_recurrency):
+        """
+        Creates the tasks of recurrencies and moves their generated end.
+
+        Args:
+            values_by_recurrency (dict): Values of the tasks to create by
+                recurrency
+
+        Returns:
+            recordset: Created tasks
+        """
+        new_tasks = self.env["hr.task"].create(
+            [
+                values
+                for values_list in values_by_recurrency.values()
+                for values in values_list
+            ]
+        )
+
+        # Update recurrency last generated datetime, one write per value
+        recurrencies_by_last_start = defaultdict(lambda: self.browse())
+        for recurrency, values_list in values_by_recurrency.items():
+            recurrencies_by_last_start[values_list[-1]["date_start"]] |= recurrency
+        for last_task_start, recurrencies in recurrencies_by_last_start.items():
+            recurrencies.write({"last_generated_end_datetime": last_task_start})
+        return new_tasks
 
     def _calculate_date_limits(self, recurrency, stop_datetime):
         """
@@ -178,39 +319,6 @@ class HrTaskRecurrency(models.Model):
             - recurrency.task_ids[0].date_start,
         }
 
-    def _create_recurring_tasks(self, template_task, recurrency, date_limits, HrTask):
-        """
-        Creates recurring tasks based on template and limits.
-
-        Args:
-            template_task: The task to use as template
-            recurrency: The recurrency record
-            date_limits: Dictionary with range_limit and task_duration
-            HrTask: Task model environment
-
-        Returns:
-            recordset: Created tasks
-        """
-        task_values_list = self._generate_task_values_list(
-            template_task,
-            recurrency,
-            date_limits["range_limit"],
-            date_limits["task_duration"],
-        )
-
-        if not task_values_list:
-            return HrTask.browse()
-
-        # Create tasks in batch
-        new_tasks = HrTask.create(task_values_list)
-
-        # Update recurrency last generated datetime
-        if new_tasks:
-            last_task_start = task_values_list[-1]["date_start"]
-            recurrency.write({"last_generated_end_datetime": last_task_start})
-
-        return new_tasks
-
     def _generate_task_values_list(self, task, recurrency, range_limit, task_duration):
         """
         Generates list of values for creating recurring tasks.
@@ -218,21 +326,10 @@ class HrTaskRecurrency(models.Model):
         Improved version with batch processing and validation.
         """
 
-        def get_next_start_dates():
-            for i in range(1, 365 * 5):  # 5 years limit
-                next_start = self.env["hr.task"]._add_delta_with_dst(
-                    task.date_start,
-                    get_timedelta(
-                        recurrency.repeat_interval * i,
-                        recurrency.repeat_unit,
-                    ),
-                )
-                if next_start >= range_limit:
-                    break
-                yield next_start
-
         # Generate all dates first
-        start_dates = list(get_next_start_dates())
+        start_dates = list(
+            self._get_occurrence_dates(recurrency, task.date_start, range_limit)
+        )
 
         if not start_dates:
             return []
@@ -257,6 +354,198 @@ class HrTaskRecurrency(models.Model):
             for start in start_dates
         ]
 
+    def _get_generated_dates(self, task):
+        """
+        Returns the dates of the current rule generated after a task.
+
+        It is called before the rule changes, so that the occurrences deleted
+        or archived from the generated ones are known when replanning.
+        """
+        self.ensure_one()
+        limit = self.last_generated_end_datetime
+        if not limit or limit <= task.date_start:
+            return set()
+        return set(
+            self._get_occurrence_dates(
+                self, task.date_start, limit + timedelta(seconds=1)
+            )
+        )
+
+    def _replan_task(self, task, generated_dates=None):
+        """
+        Brings the occurrences following a task in line with the current rule.
+
+        Args:
+            task: The occurrence the rule is anchored on
+            generated_dates (set, optional): Dates generated by the previous
+                rule, from _get_generated_dates
+
+        Returns:
+            recordset: Created tasks
+
+        Note:
+            - Occurrences still falling on a date of the rule are kept
+            - Planified occurrences that no longer fit the rule are deleted
+            - Every date of the generation window without occurrence is
+              created, unless the previous rule generated it and its
+              occurrence has been deleted or archived since
+        """
+        self.ensure_one()
+        HrTask = self.env["hr.task"]
+        following_tasks = HrTask.search(
+            [
+                ("recurrency_id", "=", self.id),
+                ("date_start", ">", task.date_start),
+            ]
+        )
+        # Generated occurrences that no longer exist, archived ones included
+        removed_dates = (generated_dates or set()) - set(
+            following_tasks.mapped("date_start")
+        )
+
+        # Dates of the rule up to its end, or up to the last existing
+        # occurrence for recurrencies without end
+        grid_limit = self._get_recurrence_end_datetime(self)
+        if not grid_limit and following_tasks:
+            grid_limit = max(following_tasks.mapped("date_start")) + timedelta(
+                seconds=1
+            )
+        valid_dates = set()
+        if grid_limit:
+            valid_dates.update(
+                self._get_occurrence_dates(self, task.date_start, grid_limit)
+            )
+
+        obsolete_tasks = following_tasks.filtered(
+            lambda t: t.state == "planified" and t.date_start not in valid_dates
+        )
+        obsolete_tasks.unlink()
+        if self._get_virtual_recurrencies():
+            # The edited task anchors the virtual occurrences of the new rule
+            task.recurrence_date = False
+            return HrTask.browse()
+
+        date_limits = self._calculate_date_limits(self, False)
+        if not date_limits:
+            return HrTask.browse()
+        task_values_list = self._generate_task_values_list(
+            task,
+            self,
+            date_limits["range_limit"],
+            date_limits["task_duration"],
+        )
+        if task_values_list:
+            self.write(
+                {"last_generated_end_datetime": task_values_list[-1]["date_start"]}
+            )
+        skipped_dates = removed_dates | set(
+            (following_tasks - obsolete_tasks).mapped("date_start")
+        )
+        missing_values_list = [
+            values
+            for values in task_values_list
+            if values["date_start"] not in skipped_dates
+        ]
+        return HrTask.create(missing_values_list)
+
+    def _get_occurrence_dates(
+        self, recurrency, date_start, range_limit=None, date_from=None
+    ):
+        """
+        Yields the start datetimes of the occurrences following ``date_start``.
+
+        Args:
+            recurrency: The recurrency record
+            date_start (datetime): Start of the reference occurrence (naive UTC)
+            range_limit (datetime, optional): Exclusive upper limit
+            date_from (datetime, optional): Inclusive lower limit, the
+                occurrences before it are skipped without being enumerated
+
+        Note:
+            - The timezone and the step are resolved once for all occurrences
+            - Each occurrence adds a whole number of steps to the reference in
+              local time, as hr.task._add_delta_with_dst does, so that shifts
+              keep their wall-clock time across DST changes
+            - At most MAX_OCCURRENCES occurrences are yielded
+        """
+        try:
+            tz = pytz.timezone(recurrency._get_recurrence_tz())
+        except pytz.UnknownTimeZoneError:
+            tz = pytz.UTC
+        step = get_timedelta(recurrency.repeat_interval, recurrency.repeat_unit)
+        local_start = (
+            date_start.replace(tzinfo=pytz.utc).astimezone(tz).replace(tzinfo=None)
+        )
+
+        def occurrence_start(index):
+            return (
+                tz.localize(local_start + step * index)
+                .astimezone(pytz.utc)
+                .replace(tzinfo=None)
+            )
+
+        first_index = 1
+        if date_from and occurrence_start(1) < date_from:
+            # Smallest index starting at date_from or later, found by doubling
+            # then halving the range of indexes
+            low, high = 1, 2
+            while occurrence_start(high) < date_from:
+                low, high = high, high * 2
+            while high - low > 1:
+                middle = (low + high) // 2
+                if occurrence_start(middle) < date_from:
+                    low = middle
+                else:
+                    high = middle
+            first_index = high
+        for i in range(first_index, first_index + MAX_OCCURRENCES - 1):
+            next_start = occurrence_start(i)
+            if range_limit and next_start >= range_limit:
+                break
+            yield next_start
+
+    def _get_recurrence_tz(self):
+        """
+        Returns the timezone the occurrences of the recurrency follow.
+
+        Virtual occurrences follow the employee the recurrency plans, so that
+        every user sees them at the same time. Generated tasks keep the
+        timezone of hr.task._add_delta_with_dst.
+        """
+        self.ensure_one()
+        HrTask = self.env["hr.task"]
+        if not self._get_virtual_recurrencies():
+            return HrTask._get_tz()
+        task = self.task_ids[:1]
+        return (
+            task.employee_id.tz
+            or task.employee_id.resource_calendar_id.tz
+            or task.company_id.resource_calendar_id.tz
+            or HrTask._get_tz()
+        )
+
+    def preview_occurrences(self, limit=10):
+        """
+        Lists the next occurrences of the recurrency without creating them.
+
+        Args:
+            limit (int): Maximum number of occurrences to return
+
+        Returns:
+            list: ``(date_start, date_end)`` tuples of naive UTC datetimes
+        """
+        self.ensure_one()
+        template_task = self._get_latest_task(self)
+        if not template_task:
+            return []
+        task_duration = template_task.date_end - template_task.date_start
+        start_dates = self._get_occurrence_dates(
+            self,
+            template_task.date_start,
+            self._get_recurrence_end_datetime(self),
+        )
+        return [(start, start + task_duration) for start in islice(start_dates, limit)]
+
     def _get_latest_task(self, recurrency):
         return self.env["hr.task"].search(
             [("recurrency_id", "=", recurrency.id)],
@@ -264,6 +553,216 @@ class HrTaskRecurrency(models.Model):
             order="date_start DESC",
         )
 
+    def _get_latest_tasks(self, domain=None):
+        """
+        Returns the latest task of each recurrency with two queries.
+
+        Args:
+            domain (list, optional): Restricts the tasks to consider
+
+        Returns:
+            dict: hr.task record by recurrency id
+        """
+        HrTask = self.env["hr.task"]
+        domain = [("recurrency_id", "in", self.ids)] + (domain or [])
+        groups = HrTask._read_group(domain, ["date_start:max"], ["recurrency_id"])
+        latest_starts = {
+            group["recurrency_id"][0]: group["date_start"] for group in groups
+        }
+        if not latest_starts:
+            return {}
+        tasks = HrTask.search(
+            domain + [("date_start", "in", list(set(latest_starts.values())))],
+            order="date_start DESC, id DESC",
+        )
+        latest_tasks = {}
+        for task in tasks:
+            recurrency_id = task.recurrency_id.id
+            if task.date_start == latest_starts[recurrency_id]:
+                latest_tasks.setdefault(recurrency_id, task)
+        return latest_tasks
+
+    @api.model
+    def _virtual_occurrences_enabled(self):
+        return bool(
+            self.env["ir.config_parameter"].sudo().get_param(VIRTUAL_OCCURRENCES_PARAM)
+        )
+
+    def _get_virtual_recurrencies(self):
+        """Returns the recurrencies whose occurrences are computed on the fly."""
+        if not self._virtual_occurrences_enabled():
+            return self.browse()
+        return self.filtered(lambda recurrency: recurrency.repeat_type == "forever")
+
+    def _get_anchor_tasks(self):
+        """
+        Returns the task each virtual recurrency is computed from.
+
+        It is the latest task that was not created from a virtual occurrence.
+
+        Returns:
+            dict: hr.task record by recurrency id
+        """
+        return self._get_latest_tasks(domain=[("recurrence_date", "=", False)])
+
+    @api.model
+    def _get_virtual_timeline_rows(self, domain, date_from, date_to, field_names):
+        """
+        Expands the virtual occurrences overlapping a period into timeline rows.
+
+        Args:
+            domain (list): Domain of the timeline, applied to the anchor tasks
+            date_from (datetime): Start of the period (naive UTC)
+            date_to (datetime): End of the period (naive UTC)
+            field_names (list): Fields of the rows
+
+        Returns:
+            list: Rows shaped as hr.task.read, with a string id and ``virtual``
+            set
+        """
+        if not self._virtual_occurrences_enabled():
+            return []
+        HrTask = self.env["hr.task"]
+        # Only the recurrencies of the allowed companies, within record rules
+        recurrencies = self.search(
+            [
+                ("repeat_type", "=", "forever"),
+                ("task_ids", "!=", False),
+                ("company_id", "in", self.env.companies.ids),
+            ]
+        )
+        anchors = recurrencies._get_anchor_tasks()
+        if not anchors:
+            return []
+        anchor_tasks = HrTask.search(
+            expression.AND(
+                [domain, [("id", "in", [task.id for task in anchors.values()])]]
+            )
+        )
+        if not anchor_tasks:
+            return []
+        recurrencies = anchor_tasks.recurrency_id
+        durations = {
+            task.recurrency_id.id: task.date_end - task.date_start
+            for task in anchor_tasks
+        }
+        search_from = date_from - max(durations.values())
+        materialized_dates = recurrencies._get_materialized_dates(search_from)
+
+        rows = []
+        for anchor_task, values in zip(anchor_tasks, anchor_tasks.read(field_names)):
+            recurrency = anchor_task.recurrency_id
+            duration = durations[recurrency.id]
+            for date_start in self._get_occurrence_dates(
+                recurrency, anchor_task.date_start, date_to, date_from - duration
+            ):
+                if date_start + duration <= date_from:
+                    continue
+                if (recurrency.id, date_start) in materialized_dates:
+                    continue
+                rows.append(
+                    dict(
+                        values,
+                        id=recurrency._get_virtual_id(date_start),
+                        date_start=date_start,
+                        date_end=date_start + duration,
+                        state="planified",
+                        has_conflict=False,
+                        virtual=True,
+                    )
+                )
+        return rows
+
+    def _get_materialized_dates(self, date_from):
+        """
+        Returns the occurrences of the recurrencies that have a task.
+
+        Returns:
+            set: ``(recurrency id, occurrence start)`` pairs after ``date_from``
+        """
+        tasks = self.env["hr.task"].search(
+            [
+                ("recurrency_id", "in", self.ids),
+                "|",
+                ("date_start", ">=", date_from),
+                ("recurrence_date", ">=", date_from),
+            ]
+        )
+        return {
+            (task.recurrency_id.id, task.recurrence_date or task.date_start)
+            for task in tasks
+        }
+
+    def _get_virtual_id(self, date_start):
+        self.ensure_one()
+        return "%s_%s_%s" % (
+            VIRTUAL_ID_PREFIX,
+            self.id,
+            date_start.strftime(VIRTUAL_ID_DATE_FORMAT),
+        )
+
+    @api.model
+    def _parse_virtual_id(self, virtual_id):
+        """
+        Returns the recurrency and the occurrence start of a virtual id.
+
+        Raises:
+            ValidationError: When the id is not a virtual occurrence
+        """
+        parts = str(virtual_id).split("_")
+        recurrency = self.browse()
+        date_start = False
+        if len(parts) == 3 and parts[0] == VIRTUAL_ID_PREFIX and parts[1].isdigit():
+            recurrency = self.browse(int(parts[1])).exists()
+            try:
+                date_start = datetime.strptime(parts[2], VIRTUAL_ID_DATE_FORMAT)
+            except ValueError:
+                date_start = False
+        if not recurrency or not date_start:
+            raise ValidationError(_("%s is not a virtual occurrence.", virtual_id))
+        return recurrency, date_start
+
+    def _materialize_occurrence(self, date_start):
+        """
+        Creates the task of a virtual occurrence, or returns the existing one.
+
+        Args:
+            date_start (datetime): Start of the occurrence in the rule
+
+        Returns:
+            hr.task record
+        """
+        self.ensure_one()
+        HrTask = self.env["hr.task"]
+        task = HrTask.search(
+            [
+                ("recurrency_id", "=", self.id),
+                "|",
+                ("recurrence_date", "=", date_start),
+                "&",
+                ("recurrence_date", "=", False),
+                ("date_start", "=", date_start),
+            ],
+            limit=1,
+        )
+        if task:
+            return task
+        anchor_task = self._get_anchor_tasks().get(self.id)
+        if not anchor_task:
+            raise ValidationError(_("The recurrency has no task to repeat."))
+        values = self._generate_task_values_list(
+            anchor_task,
+            self,
+            date_start + timedelta(seconds=1),
+            anchor_task.date_end - anchor_task.date_start,
+        )
+        values = [value for value in values if value["date_start"] == date_start]
+        if not values:
+            raise ValidationError(
+                _("The recurrency has no occurrence starting at %s.", date_start)
+            )
+        return HrTask.create(dict(values[0], recurrence_date=date_start))
+
     def _get_recurrence_end_datetime(self, recurrency):
         if recurrency.repeat_type == "until":
             return recurrency.repeat_until
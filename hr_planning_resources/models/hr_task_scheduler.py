@@ -0,0 +1,187 @@
+from bisect import bisect_left
+from datetime import timedelta
+
+import pytz
+
+from odoo import api, models
+
+TYPE_FIELDS = {
+    "project.task": ("task", "task_id"),
+    "project.project": ("project", "project_id"),
+    "helpdesk.ticket": ("ticket", "ticket_id"),
+}
+
+
+def _merge_intervals(intervals):
+    """Merge sorted ``(start, stop)`` intervals overlapping each other."""
+    merged = []
+    for start, stop in intervals:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def _subtract_intervals(intervals, bookings):
+    """Remove merged, sorted ``bookings`` from sorted ``intervals``."""
+    result = []
+    index = 0
+    for start, stop in intervals:
+        while index < len(bookings) and bookings[index][1] <= start:
+            index += 1
+        cursor = start
+        for booking_start, booking_stop in bookings[index:]:
+            if booking_start >= stop:
+                break
+            if booking_start > cursor:
+                result.append((cursor, booking_start))
+            cursor = max(cursor, booking_stop)
+        if cursor < stop:
+            result.append((cursor, stop))
+    return result
+
+
+def _split_runs(free_intervals, bookings):
+    """
+    Group free intervals into runs, a run ending where a booking starts.
+
+    A task can span the non-working time between the intervals of a run, but
+    not a booking. Each run is a ``[intervals, seconds]`` list.
+    """
+    booking_starts = [start for start, _stop in bookings]
+    runs = []
+    for start, stop in free_intervals:
+        seconds = (stop - start).total_seconds()
+        if runs:
+            last_stop = runs[-1][0][-1][1]
+            # Is there a booking starting between the last interval and this one?
+            if bisect_left(booking_starts, last_stop) == bisect_left(
+                booking_starts, start
+            ):
+                runs[-1][0].append((start, stop))
+                runs[-1][1] += seconds
+                continue
+        runs.append([[(start, stop)], seconds])
+    return runs
+
+
+def _fit_in_run(run, seconds):
+    """Return the end of a task of ``seconds`` working seconds starting the run."""
+    remaining = seconds
+    for start, stop in run[0]:
+        duration = (stop - start).total_seconds()
+        if duration >= remaining:
+            return start + timedelta(seconds=remaining)
+        remaining -= duration
+    return None
+
+
+def _consume_run(runs, index, date_end):
+    """Replace the run by what remains of it after ``date_end``."""
+    intervals = [
+        (max(start, date_end), stop)
+        for start, stop in runs[index][0]
+        if stop > date_end
+    ]
+    if intervals:
+        seconds = sum((stop - start).total_seconds() for start, stop in intervals)
+        runs[index] = [intervals, seconds]
+    else:
+        del runs[index]
+
+
+class HrTaskScheduler(models.AbstractModel):
+    _name = "hr.task.scheduler"
+    _description = "HR Task Automatic Scheduler"
+
+    @api.model
+    def propose(self, items, employees, date_from, date_to):
+        """
+        Places unplanned work into the earliest free working time.
+
+        Args:
+            items (list): ``(record, hours)`` pairs, by priority, where record
+                is a project.task, project.project or helpdesk.ticket
+            employees: hr.employee or hr.department records of the candidates
+            date_from (datetime): Start of the window (naive UTC)
+            date_to (datetime): End of the window (naive UTC)
+
+        Returns:
+            dict: ``proposals``, the list of hr.task values to confirm, and
+            ``unplanned``, the items that do not fit in the window
+
+        Note:
+            - Free time is the working time, time off excluded, minus the
+              tasks already booked; it is split into runs at each booking
+            - Each item goes to the candidate whose first run with enough
+              hours starts first, and the run is then consumed
+        """
+        if employees._name == "hr.department":
+            employees = employees.member_ids
+        HrTask = self.env["hr.task"]
+        work_intervals = HrTask._get_work_intervals_batch(employees, date_from, date_to)
+        bookings_by_employee = {employee.id: [] for employee in employees}
+        booked_tasks = HrTask._search_overlapping(
+            employees, date_from, date_to, domain=[("state", "!=", "cancel")]
+        )
+        for task in booked_tasks:
+            bookings_by_employee[task.employee_id.id].append(
+                (
+                    pytz.utc.localize(task.date_start),
+                    pytz.utc.localize(task.date_end),
+                )
+            )
+
+        runs_by_employee = {}
+        for employee in employees:
+            bookings = _merge_intervals(sorted(bookings_by_employee[employee.id]))
+            free_intervals = _subtract_intervals(work_intervals[employee.id], bookings)
+            runs_by_employee[employee.id] = _split_runs(free_intervals, bookings)
+
+        proposals = []
+        unplanned = []
+        for record, hours in items:
+            seconds = hours * 3600
+            best = None
+            if seconds <= 0:
+                unplanned.append((record, hours))
+                continue
+            for employee_id, runs in runs_by_employee.items():
+                for index, run in enumerate(runs):
+                    run_start = run[0][0][0]
+                    if best and run_start >= best[0]:
+                        break
+                    if run[1] >= seconds:
+                        best = (
+                            run_start,
+                            _fit_in_run(run, seconds),
+                            employee_id,
+                            index,
+                        )
+                        break
+            if not best:
+                unplanned.append((record, hours))
+                continue
+            date_start, date_end, employee_id, index = best
+            _consume_run(runs_by_employee[employee_id], index, date_end)
+            proposals.append(
+                self._prepare_task_values(record, employee_id, date_start, date_end)
+            )
+        return {"proposals": proposals, "unplanned": unplanned}
+
+    @api.model
+    def _prepare_task_values(self, record, employee_id, date_start, date_end):
+        task_type, field_name = TYPE_FIELDS[record._name]
+        return {
+            "type": task_type,
+            field_name: record.id,
+            "employee_id": employee_id,
+            "date_start": date_start.astimezone(pytz.utc).replace(tzinfo=None),
+            "date_end": date_end.astimezone(pytz.utc).replace(tzinfo=None),
+        }
+
+    @api.model
+    def confirm(self, proposals):
+        """Creates the proposed tasks in a single batch."""
+        return self.env["hr.task"].create(proposals)
@@ -0,0 +1,99 @@
+from odoo import fields, models, tools
+
+
+class HrTaskUtilization(models.Model):
+    _name = "hr.task.utilization"
+    _description = "HR Planning Utilization"
+    _auto = False
+    _order = "week desc, employee_id"
+
+    employee_id = fields.Many2one("hr.employee", readonly=True)
+    department_id = fields.Many2one("hr.department", readonly=True)
+    company_id = fields.Many2one("res.company", readonly=True)
+    week = fields.Date(readonly=True, help="First day of the week")
+    planned_hours = fields.Float(
+        readonly=True,
+        help="Allocated hours of the tasks starting in the week, in the timezone "
+        "of the employee",
+    )
+    capacity_hours = fields.Float(
+        readonly=True,
+        help="Hours of the working schedule in the week, empty when the week is "
+        "outside of the capacity horizon",
+    )
+    leave_hours = fields.Float(
+        readonly=True, help="Working hours lost to time off in the week"
+    )
+    available_hours = fields.Float(
+        readonly=True, help="Working hours left once the time off is deducted"
+    )
+    free_hours = fields.Float(
+        readonly=True, help="Available hours that are not planned yet"
+    )
+
+    def init(self):
+        # Planned hours come from the stored allocated hours, the available
+        # ones from the daily capacity table, both summed by employee and by
+        # week of the employee's timezone. Weeks whose capacity is not fully
+        # computed, outside of the capacity horizon, have no available hours.
+        # The id is derived from the employee and the week, counted from the
+        # Monday 1970-01-05, so that it does not change between reads.
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(  # pylint: disable=sql-injection
+            f"""
+            CREATE OR REPLACE VIEW {self._table} AS (
+                WITH planned AS (
+                    SELECT
+                        t.employee_id,
+                        date_trunc(
+                            'week',
+                            t.date_start AT TIME ZONE 'UTC'
+                                AT TIME ZONE COALESCE(r.tz, 'UTC')
+                        )::date AS week,
+                        SUM(t.allocated_hours) AS planned_hours
+                    FROM hr_task t
+                    JOIN hr_employee te ON te.id = t.employee_id
+                    JOIN resource_resource r ON r.id = te.resource_id
+                    WHERE t.state != 'cancel'
+                    GROUP BY 1, 2
+                ),
+                capacity AS (
+                    SELECT
+                        employee_id,
+                        date_trunc('week', date)::date AS week,
+                        COUNT(*) AS day_count,
+                        SUM(capacity_hours) AS capacity_hours,
+                        SUM(leave_hours) AS leave_hours
+                    FROM hr_employee_capacity
+                    GROUP BY employee_id, date_trunc('week', date)::date
+                ),
+                utilization AS (
+                    SELECT
+                        employee_id,
+                        week,
+                        COALESCE(p.planned_hours, 0) AS planned_hours,
+                        CASE WHEN c.day_count = 7 THEN c.capacity_hours END
+                            AS capacity_hours,
+                        CASE WHEN c.day_count = 7 THEN c.leave_hours END
+                            AS leave_hours
+                    FROM planned p
+                    FULL OUTER JOIN capacity c USING (employee_id, week)
+                )
+                SELECT
+                    u.employee_id::bigint * 100000
+                        + (u.week - DATE '1970-01-05') / 7 AS id,
+                    u.employee_id,
+                    e.department_id,
+                    e.company_id,
+                    u.week,
+                    u.planned_hours,
+                    u.capacity_hours,
+                    u.leave_hours,
+                    u.capacity_hours - u.leave_hours AS available_hours,
+                    u.capacity_hours - u.leave_hours - u.planned_hours
+                        AS free_hours
+                FROM utilization u
+                JOIN hr_employee e ON e.id = u.employee_id
+            )
+            """
+        )
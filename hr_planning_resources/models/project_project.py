@@ -5,12 +5,7 @@ class ProjectProject(models.Model):
     _name = "project.project"
     _inherit = ["project.project", "hr.task.mixin"]
 
-    def _compute_hr_task_count(self):
-        for record in self:
-            project_count = self.env["hr.task"].search_count(
-                [("project_id", "=", record.id)]
-            )
-            record.hr_task_count = project_count
+    _hr_task_field = "project_id"
 
     @api.model_create_multi
     def create(self, vals_list):
@@ -5,10 +5,7 @@ class ProjectTask(models.Model):
     _name = "project.task"
     _inherit = ["project.task", "hr.task.mixin"]
 
-    def _compute_hr_task_count(self):
-        for record in self:
-            task_count = self.env["hr.task"].search_count([("task_id", "=", record.id)])
-            record.hr_task_count = task_count
+    _hr_task_field = "task_id"
 
     @api.model_create_multi
     def create(self, vals_list):
@@ -0,0 +1,130 @@
+from datetime import datetime, time, timedelta
+
+import pytz
+
+from odoo import fields, models
+from odoo.tools import frozendict
+from odoo.tools.lru import LRU
+
+CACHE_FIELDS = {
+    "tz",
+    "attendance_ids",
+    "leave_ids",
+    "global_leave_ids",
+    "two_weeks_calendar",
+}
+# Number of calendar expansions kept by each process
+WORK_INTERVALS_CACHE_SIZE = 512
+VERSION_SEQUENCE = "resource_calendar_work_intervals_version_seq"
+
+_work_intervals_cache = LRU(WORK_INTERVALS_CACHE_SIZE)
+
+
+class ResourceCalendar(models.Model):
+    _inherit = "resource.calendar"
+
+    work_intervals_version = fields.Integer(
+        readonly=True,
+        copy=False,
+        help="Changes each time the work intervals of the calendar change",
+    )
+
+    def init(self):
+        # Versions are never given twice, even by rolled back transactions
+        self.env.cr.execute(f"CREATE SEQUENCE IF NOT EXISTS {VERSION_SEQUENCE}")
+
+    def write(self, vals):
+        result = super().write(vals)
+        if CACHE_FIELDS.intersection(vals):
+            self._invalidate_work_intervals()
+        if {"tz", "two_weeks_calendar"}.intersection(vals):
+            self.env["hr.employee.capacity"]._schedule_refresh_calendars(self)
+        return result
+
+    def _invalidate_work_intervals(self):
+        """
+        Gives a new version to the work intervals of the calendars.
+
+        The version is part of the key of the cached expansions, so only the
+        expansions of these calendars are dropped, in every process.
+        """
+        if not self:
+            return
+        self.env.cr.execute(
+            f"""
+            UPDATE resource_calendar
+            SET work_intervals_version = nextval('{VERSION_SEQUENCE}')
+            WHERE id IN %s
+            """,
+            (tuple(self.ids),),
+        )
+        self.invalidate_recordset(["work_intervals_version"])
+
+    def _get_work_intervals(self, start, end, resources=None):
+        """
+        Returns the work intervals of the calendar, time off excluded.
+
+        The calendar is expanded over whole local days of its timezone, and the
+        expansion is kept in a bounded cache of the process, keyed by the
+        version of the calendar.
+
+        Args:
+            start (datetime): Aware start of the period
+            end (datetime): Aware end of the period
+            resources: resource.resource records, or None for the calendar
+
+        Returns:
+            dict: Sorted ``(start, stop)`` UTC datetimes clipped to the period,
+            by resource id, the calendar's own intervals being under False
+        """
+        self.ensure_one()
+        start = start.astimezone(pytz.utc)
+        end = end.astimezone(pytz.utc)
+        tz = pytz.timezone(self.tz or "UTC")
+        # The timezones are part of the key, as the expansion depends on them
+        resource_tzs = tuple((resource.id, resource.tz) for resource in resources or [])
+        key = (
+            self.env.cr.dbname,
+            self.id,
+            self.work_intervals_version,
+            resource_tzs,
+            start.astimezone(tz).date(),
+            end.astimezone(tz).date(),
+        )
+        intervals = _work_intervals_cache.get(key)
+        if intervals is None:
+            intervals = _work_intervals_cache[key] = self._expand_work_intervals(
+                resource_tzs, key[-2], key[-1]
+            )
+        return {
+            resource_id: [
+                (max(interval_start, start), min(interval_stop, end))
+                for interval_start, interval_stop in resource_intervals
+                if interval_start < end and interval_stop > start
+            ]
+            for resource_id, resource_intervals in intervals.items()
+        }
+
+    def _expand_work_intervals(self, resource_tzs, date_from, date_to):
+        """Expands the work intervals between two local days, in UTC."""
+        tz = pytz.timezone(self.tz or "UTC")
+        resources = self.env["resource.resource"].browse(
+            [resource_id for resource_id, _tz in resource_tzs]
+        )
+        intervals = self.sudo()._work_intervals_batch(
+            tz.localize(datetime.combine(date_from, time.min)),
+            tz.localize(datetime.combine(date_to + timedelta(days=1), time.min)),
+            resources=resources or None,
+        )
+        return frozendict(
+            {
+                resource_id: tuple(
+                    (
+                        interval_start.astimezone(pytz.utc),
+                        interval_stop.astimezone(pytz.utc),
+                    )
+                    for interval_start, interval_stop, _meta in resource_intervals
+                )
+                for resource_id, resource_intervals in intervals.items()
+            }
+        )
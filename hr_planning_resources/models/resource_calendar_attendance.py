@@ -0,0 +1,30 @@
+from odoo import api, models
+
+
+class ResourceCalendarAttendance(models.Model):
+    _inherit = "resource.calendar.attendance"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        attendances = super().create(vals_list)
+        attendances.calendar_id._invalidate_work_intervals()
+        self.env["hr.employee.capacity"]._schedule_refresh_calendars(
+            attendances.calendar_id
+        )
+        return attendances
+
+    def write(self, vals):
+        calendars = self.calendar_id
+        result = super().write(vals)
+        (calendars | self.calendar_id)._invalidate_work_intervals()
+        self.env["hr.employee.capacity"]._schedule_refresh_calendars(
+            calendars | self.calendar_id
+        )
+        return result
+
+    def unlink(self):
+        calendars = self.calendar_id
+        result = super().unlink()
+        calendars._invalidate_work_intervals()
+        self.env["hr.employee.capacity"]._schedule_refresh_calendars(calendars)
+        return result
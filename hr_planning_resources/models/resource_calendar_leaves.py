@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+from odoo import api, models
+
+RECOMPUTE_FIELDS = {
+    "company_id",
+    "resource_id",
+    "calendar_id",
+    "time_type",
+    "date_from",
+    "date_to",
+}
+
+
+class ResourceCalendarLeaves(models.Model):
+    _inherit = "resource.calendar.leaves"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        leaves = super().create(vals_list)
+        leaves._get_affected_calendars()._invalidate_work_intervals()
+        leaves._get_overlapping_hr_tasks()._recompute_leave_warning()
+        leaves._refresh_employee_capacity(leaves._get_capacity_scopes())
+        return leaves
+
+    def write(self, vals):
+        if not RECOMPUTE_FIELDS.intersection(vals):
+            return super().write(vals)
+        # Tasks and capacity overlapping the leaves before and after the change
+        tasks = self._get_overlapping_hr_tasks()
+        scopes = self._get_capacity_scopes()
+        calendars = self._get_affected_calendars()
+        result = super().write(vals)
+        (calendars | self._get_affected_calendars())._invalidate_work_intervals()
+        tasks |= self._get_overlapping_hr_tasks()
+        tasks._recompute_leave_warning()
+        self._refresh_employee_capacity(scopes + self._get_capacity_scopes())
+        return result
+
+    def unlink(self):
+        tasks = self._get_overlapping_hr_tasks()
+        scopes = self._get_capacity_scopes()
+        calendars = self._get_affected_calendars()
+        result = super().unlink()
+        calendars._invalidate_work_intervals()
+        tasks._recompute_leave_warning()
+        self._refresh_employee_capacity(scopes)
+        return result
+
+    def _get_relevant_employee_domain(self):
+        """Return the domain of the employees concerned by the leave.
+
+        It mirrors the buckets of hr.leave._group_leaves_by_employee: an empty
+        company, resource or calendar applies to any employee.
+        """
+        self.ensure_one()
+        domain = []
+        if self.company_id:
+            domain.append(("company_id", "=", self.company_id.id))
+        if self.resource_id:
+            domain.append(("resource_id", "=", self.resource_id.id))
+        if self.calendar_id:
+            domain.append(("resource_calendar_id", "=", self.calendar_id.id))
+        return domain
+
+    def _get_affected_calendars(self):
+        """Return the calendars whose work intervals depend on the leaves."""
+        Calendar = self.env["resource.calendar"].sudo()
+        if not all(self.mapped("calendar_id")):
+            # Leaves without calendar apply to every calendar
+            return Calendar.search([])
+        return self.calendar_id.sudo()
+
+    def _get_capacity_scopes(self):
+        """Return the (employees, date_from, date_to) capacity the leaves affect."""
+        Employee = self.env["hr.employee"].sudo()
+        return [
+            (
+                Employee.search(leave._get_relevant_employee_domain()),
+                # One more day on each side covers the timezone offsets
+                leave.date_from.date() - timedelta(days=1),
+                leave.date_to.date() + timedelta(days=1),
+            )
+            for leave in self
+            if leave.date_from and leave.date_to
+        ]
+
+    @api.model
+    def _refresh_employee_capacity(self, scopes):
+        Capacity = self.env["hr.employee.capacity"]
+        for employees, date_from, date_to in scopes:
+            Capacity._refresh(employees, date_from, date_to)
+
+    def _get_overlapping_hr_tasks(self):
+        """Return the hr.task records whose leave warning depends on the leaves."""
+        HrTask = self.env["hr.task"].sudo()
+        tasks = HrTask
+        for leave in self:
+            if not (leave.date_from and leave.date_to):
+                continue
+            domain = [
+                (f"employee_id.{field_name}", operator, value)
+                for field_name, operator, value in leave._get_relevant_employee_domain()
+            ]
+            tasks |= HrTask._search_overlapping(
+                None, leave.date_from, leave.date_to, domain=domain
+            )
+        return tasks
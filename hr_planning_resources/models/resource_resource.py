@@ -0,0 +1,16 @@
+from odoo import models
+
+
+class ResourceResource(models.Model):
+    _inherit = "resource.resource"
+
+    def write(self, vals):
+        result = super().write(vals)
+        if "tz" in vals:
+            self.env["hr.employee.capacity"]._schedule_refresh(
+                self.env["hr.employee"]
+                .sudo()
+                .with_context(active_test=False)
+                .search([("resource_id", "in", self.ids)])
+            )
+        return result
@@ -2,8 +2,53 @@
 
 import TimelineController from "web_timeline.TimelineController";
 
+// Bus channel prefix of hr.task changes, suffixed by the company id
+const TIMELINE_CHANNEL = "hr_planning_resources.timeline";
+
 TimelineController.include({
+    custom_events: _.extend({}, TimelineController.prototype.custom_events, {
+        hr_task_range_changed: "_onHrTaskRangeChanged",
+    }),
+
+    start: function () {
+        if (this.modelName === "hr.task") {
+            const companyIds = this.context.allowed_company_ids || [];
+            this._hrTaskChannels = companyIds.map(
+                (companyId) => `${TIMELINE_CHANNEL}_${companyId}`
+            );
+            this._onHrTaskNotification = this._onHrTaskNotification.bind(this);
+            for (const channel of this._hrTaskChannels) {
+                this.call("bus_service", "addChannel", channel);
+            }
+            this.call(
+                "bus_service",
+                "addEventListener",
+                "notification",
+                this._onHrTaskNotification
+            );
+        }
+        return this._super(...arguments);
+    },
+
+    destroy: function () {
+        if (this._hrTaskChannels) {
+            this.call(
+                "bus_service",
+                "removeEventListener",
+                "notification",
+                this._onHrTaskNotification
+            );
+            for (const channel of this._hrTaskChannels) {
+                this.call("bus_service", "deleteChannel", channel);
+            }
+        }
+        this._super(...arguments);
+    },
+
     create_completed: function (id) {
+        if (this.modelName === "hr.task") {
+            return this._hrTaskCreateCompleted(id);
+        }
         const self = this;
         return this._rpc({
             model: this.model.modelName,
@@ -24,4 +69,228 @@ TimelineController.include({
             this.update(params, {adjust_window: false});
         });
     },
+
+    /**
+     * Virtual occurrences of recurrencies get a task before being opened.
+     *
+     * @override
+     */
+    _onUpdate: function (event) {
+        const item = event.data.item;
+        if (!this._isHrTaskVirtualItem(item)) {
+            return this._super(...arguments);
+        }
+        const _super = this._super.bind(this);
+        return this._materializeHrTask(item).then((newItem) => {
+            event.data.item = newItem;
+            return _super(event);
+        });
+    },
+
+    /**
+     * Virtual occurrences of recurrencies get a task before being moved.
+     *
+     * @override
+     */
+    _onMove: function (event) {
+        const item = event.data.item;
+        if (!this._isHrTaskVirtualItem(item)) {
+            return this._super(...arguments);
+        }
+        const _super = this._super.bind(this);
+        return this._materializeHrTask(item).then((newItem) => {
+            event.data.item = Object.assign({}, item, {
+                id: newItem.id,
+                evt: newItem.evt,
+            });
+            return _super(event);
+        });
+    },
+
+    /**
+     * @private
+     * @param {Object} item timeline item
+     * @returns {Boolean}
+     */
+    _isHrTaskVirtualItem: function (item) {
+        return this.modelName === "hr.task" && Boolean(item.evt && item.evt.virtual);
+    },
+
+    /**
+     * Create the task of a virtual occurrence and draw it in its place.
+     *
+     * @private
+     * @param {Object} item timeline item of the virtual occurrence
+     * @returns {Promise<Object>} timeline item of the task
+     */
+    _materializeHrTask: function (item) {
+        return this._rpc({
+            model: this.modelName,
+            method: "materialize_virtual_occurrences",
+            args: [[item.id]],
+            context: this.context,
+        })
+            .then(([taskId]) =>
+                this.model.fetchTimelineRows({
+                    domain: [["id", "=", taskId]],
+                    groupBy: this.renderer.last_group_bys,
+                })
+            )
+            .then((records) => {
+                this._removeHrTaskRecords([item.id]);
+                return this._addHrTaskRecords(records)[0];
+            });
+    },
+
+    /**
+     * Draw the created task from its compact row, only reloading the whole
+     * timeline when its group is not displayed yet.
+     *
+     * @private
+     * @param {Number} id
+     * @returns {Promise}
+     */
+    _hrTaskCreateCompleted: function (id) {
+        return this.model
+            .fetchTimelineRows({
+                domain: [["id", "=", id]],
+                groupBy: this.renderer.last_group_bys,
+            })
+            .then((records) => this._addHrTaskRecords(records));
+    },
+
+    /**
+     * Add or refresh records in the model data and in the timeline items,
+     * rendering the timeline again when a record belongs to a group that is
+     * not displayed yet.
+     *
+     * @private
+     * @param {Array} records compact rows of get_timeline_data
+     * @returns {Array} timeline items of the records
+     */
+    _addHrTaskRecords: function (records) {
+        const data = this.model.data.data;
+        const items = records.map((record) => {
+            const index = data.findIndex((event) => event.id === record.id);
+            if (index === -1) {
+                data.push(record);
+            } else {
+                data[index] = record;
+            }
+            return this.renderer.event_data_transform(record);
+        });
+        const groups = this.renderer.timeline.groupsData;
+        if (items.some((item) => !groups.get(item.group))) {
+            // The groups of the timeline are built from the loaded records
+            this.update(
+                {
+                    domain: this.renderer.last_domains,
+                    context: this.context,
+                    groupBy: this.renderer.last_group_bys,
+                },
+                {adjust_window: false, reload: false}
+            );
+        } else {
+            this.renderer.timeline.itemsData.update(items);
+        }
+        return items;
+    },
+
+    /**
+     * Remove records from the model data and from the timeline items.
+     *
+     * @private
+     * @param {Array} ids
+     */
+    _removeHrTaskRecords: function (ids) {
+        this.model.data.data = this.model.data.data.filter(
+            (event) => !ids.includes(event.id)
+        );
+        this.renderer.timeline.itemsData.remove(ids);
+    },
+
+    /**
+     * Patch the timeline with the tasks changed by other users.
+     *
+     * @private
+     * @param {CustomEvent} ev
+     * @returns {Promise}
+     */
+    _onHrTaskNotification: function ({detail: notifications}) {
+        const proms = [];
+        for (const {type, payload} of notifications) {
+            if (type !== "hr_task_changed" || !this.renderer.timeline) {
+                continue;
+            }
+            if (payload.event === "unlink") {
+                this._removeHrTaskRecords(payload.ids);
+                continue;
+            }
+            const prom = this.model
+                .fetchTimelineRows({
+                    domain: [
+                        ...(this.model.data.domain || []),
+                        ["id", "in", payload.ids],
+                    ],
+                    groupBy: this.renderer.last_group_bys,
+                })
+                .then((records) => {
+                    const foundIds = records.map((record) => record.id);
+                    // Tasks that no longer match the domain of the view
+                    this._removeHrTaskRecords(
+                        payload.ids.filter((id) => !foundIds.includes(id))
+                    );
+                    this._addHrTaskRecords(records);
+                });
+            proms.push(prom);
+        }
+        return Promise.all(proms);
+    },
+
+    /**
+     * Load the tasks of the part of the visible range that is not loaded yet,
+     * with a margin of one visible width.
+     *
+     * @private
+     * @param {OdooEvent} ev
+     * @returns {Promise}
+     */
+    _onHrTaskRangeChanged: function (ev) {
+        const loaded = this.model.loaded_window;
+        const start = ev.data.start;
+        const end = ev.data.end;
+        if (!loaded || (start >= loaded.start && end <= loaded.end)) {
+            return Promise.resolve();
+        }
+        const span = end - start;
+        const windows = [];
+        if (end < loaded.start || start > loaded.end) {
+            // Far jump: load around the visible range only
+            loaded.start = new Date(start.getTime() - span);
+            loaded.end = new Date(end.getTime() + span);
+            windows.push([loaded.start, loaded.end]);
+        } else {
+            if (start < loaded.start) {
+                const windowStart = new Date(start.getTime() - span);
+                windows.push([windowStart, loaded.start]);
+                loaded.start = windowStart;
+            }
+            if (end > loaded.end) {
+                const windowEnd = new Date(end.getTime() + span);
+                windows.push([loaded.end, windowEnd]);
+                loaded.end = windowEnd;
+            }
+        }
+        return Promise.all(
+            windows.map(([windowStart, windowEnd]) =>
+                this.model
+                    .fetchTimelineRows({
+                        start: windowStart,
+                        end: windowEnd,
+                        groupBy: this.renderer.last_group_bys,
+                    })
+                    .then((records) => this._addHrTaskRecords(records))
+            )
+        );
+    },
 });
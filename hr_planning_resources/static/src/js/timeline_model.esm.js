@@ -0,0 +1,73 @@
+/** @odoo-module */
+
+import TimelineModel from "web_timeline.TimelineModel";
+
+// Days loaded on each side of today when the planning timeline opens
+const INITIAL_WINDOW_DAYS = 31;
+
+function serializeDatetime(date) {
+    return moment(date).utc().format("YYYY-MM-DD HH:mm:ss");
+}
+
+TimelineModel.include({
+    load: function (params) {
+        if (params.groupBy && params.groupBy.length) {
+            this.group_bys = params.groupBy;
+        } else {
+            this.group_bys = [params.default_group_by || this.default_group_by];
+        }
+        return this._super(...arguments);
+    },
+
+    /**
+     * Planning tasks are read through get_timeline_data, which only returns
+     * the fields the timeline draws, for the loaded time window.
+     *
+     * @override
+     */
+    _loadTimeline: function () {
+        if (this.modelName !== "hr.task") {
+            return this._super(...arguments);
+        }
+        if (!this.loaded_window) {
+            this.loaded_window = {
+                start: moment().subtract(INITIAL_WINDOW_DAYS, "days").toDate(),
+                end: moment().add(INITIAL_WINDOW_DAYS, "days").toDate(),
+            };
+        }
+        return this.fetchTimelineRows({
+            start: this.loaded_window.start,
+            end: this.loaded_window.end,
+            groupBy: this.group_bys,
+        }).then((events) => {
+            this.data.data = events;
+            this.data.rights = {
+                unlink: this.unlink_right,
+                create: this.create_right,
+                write: this.write_right,
+            };
+        });
+    },
+
+    /**
+     * @param {Object} options
+     * @param {Array} [options.domain] defaults to the domain of the view
+     * @param {Date} [options.start] start of the time window to load
+     * @param {Date} [options.end] end of the time window to load
+     * @param {Array} [options.groupBy] fields the timeline is grouped by
+     * @returns {Promise<Array>} compact rows of the timeline
+     */
+    fetchTimelineRows: function (options) {
+        return this._rpc({
+            model: this.modelName,
+            method: "get_timeline_data",
+            kwargs: {
+                domain: options.domain || this.data.domain,
+                date_from: options.start && serializeDatetime(options.start),
+                date_to: options.end && serializeDatetime(options.end),
+                group_by: options.groupBy || this.group_bys,
+                context: this.data.context,
+            },
+        });
+    },
+});
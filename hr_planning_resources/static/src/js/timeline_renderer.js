@@ -7,6 +7,27 @@ odoo.define("hr_task_planner.timeline_renderer", function (require) {
         events: _.extend({}, TimelineRenderer.prototype.events, {
             "click .oe_hr_task_planner_new_task": "_onNewTask",
         }),
+        init_timeline: function () {
+            this._super.apply(this, arguments);
+            if (this.modelName === "hr.task") {
+                this.timeline.on("rangechanged", this._onHrTaskRangeChanged.bind(this));
+            }
+        },
+        event_data_transform: function (evt) {
+            const item = this._super.apply(this, arguments);
+            if (this.modelName === "hr.task" && evt.virtual) {
+                // Virtual occurrences have no task to delete yet
+                item.editable = {updateTime: true, updateGroup: true, remove: false};
+                item.className = `${item.className || ""} o_hr_task_virtual`.trim();
+            }
+            return item;
+        },
+        _onHrTaskRangeChanged: function (properties) {
+            this.trigger_up("hr_task_range_changed", {
+                start: properties.start,
+                end: properties.end,
+            });
+        },
         _onNewTask: function (ev) {
             ev.preventDefault();
             this.on_add(ev, () => {
@@ -1 +1,3 @@
 from . import test_hr_task
+from . import test_hr_task_benchmark
+from . import test_hr_task_query_count
@@ -1,3 +1,5 @@
+import random
+
 from dateutil.relativedelta import relativedelta
 
 from odoo import Command, fields
@@ -92,3 +94,54 @@ class TestHrPlanningCommon(common.TransactionCase):
                 "date_end": fields.Datetime.now() + relativedelta(days=1),
             }
         )
+
+    def create_planning_data(
+        self, employee_count, task_count, leave_count=0, recurrency_count=0, seed=0
+    ):
+        # Generate a reproducible planning for the given sizes
+        rng = random.Random(seed)
+        employees = self.env["hr.employee"].create(
+            [
+                {"name": "Employee %s" % index, "department_id": self.department.id}
+                for index in range(employee_count)
+            ]
+        )
+        start = fields.Datetime.now().replace(minute=0, second=0, microsecond=0)
+        task_values = []
+        for _index in range(task_count):
+            date_start = start + relativedelta(
+                days=rng.randrange(60), hours=rng.randrange(24)
+            )
+            task_values.append(
+                {
+                    "employee_id": rng.choice(employees).id,
+                    "task_id": self.task.id,
+                    "type": "task",
+                    "date_start": date_start,
+                    "date_end": date_start + relativedelta(hours=rng.randint(1, 48)),
+                }
+            )
+        tasks = self.env["hr.task"].create(task_values)
+        leave_values = []
+        for _index in range(leave_count):
+            employee = rng.choice(employees)
+            date_from = start + relativedelta(days=rng.randrange(60))
+            leave_values.append(
+                {
+                    "name": "Time Off",
+                    "resource_id": employee.resource_id.id,
+                    "calendar_id": employee.resource_calendar_id.id,
+                    "date_from": date_from,
+                    "date_to": date_from + relativedelta(days=rng.randint(1, 5)),
+                }
+            )
+        leaves = self.env["resource.calendar.leaves"].create(leave_values)
+        for task in tasks[:recurrency_count]:
+            task.write(
+                {
+                    "repeat": True,
+                    "repeat_type": "forever",
+                    "repeat_unit": rng.choice(["day", "week", "month"]),
+                }
+            )
+        return employees, tasks, leaves
@@ -1,3 +1,14 @@
+from datetime import date, datetime, time
+
+import pytz
+from dateutil.relativedelta import relativedelta
+from werkzeug.exceptions import BadRequest
+
+from odoo import fields
+from odoo.exceptions import UserError
+
+from ..controllers.main import HrPlanningExport
+from ..models.hr_task_perf_sample import profiled
 from .common import TestHrPlanningCommon
 
 
@@ -29,3 +40,695 @@ class TestHrTask(TestHrPlanningCommon):
         self.assertEqual(hr_task_ticket.ticket_id, self.ticket)
         self.assertEqual(hr_task_ticket.project_id.id, False)
         self.assertEqual(hr_task_ticket.task_id.id, False)
+
+    def test_03_hr_task_allocated_hours_batch(self):
+        # Tasks created together must get the same hours as one by one
+        employee = self.john_doe_employee
+        date_start = fields.Datetime.now().replace(hour=6, minute=0, second=0)
+        tasks = self.env["hr.task"].create(
+            [
+                {
+                    "employee_id": employee.id,
+                    "task_id": self.task.id,
+                    "type": "task",
+                    "date_start": date_start + relativedelta(days=day),
+                    "date_end": date_start + relativedelta(days=day, hours=10),
+                }
+                for day in range(5)
+            ]
+        )
+        for task in tasks:
+            hours = employee._get_work_days_data_batch(task.date_start, task.date_end)[
+                employee.id
+            ]["hours"]
+            self.assertAlmostEqual(task.allocated_hours, hours, places=2)
+
+        tasks[0].is_recompute_forced = True
+        self.assertEqual(tasks[0].allocated_hours, 10.0)
+
+    def test_04_hr_task_leave_warning_invalidation(self):
+        # The stored warning follows the public holidays of the task period
+        hr_task = self.create_hr_task()
+        self.assertFalse(hr_task.leave_warning)
+        holiday = self.env["resource.calendar.leaves"].create(
+            {
+                "name": "Public Holiday",
+                "calendar_id": False,
+                "date_from": hr_task.date_start,
+                "date_to": hr_task.date_end,
+            }
+        )
+        self.assertIn("is on time off", hr_task.leave_warning)
+        # The stored message does not depend on who triggers the recompute
+        warning = hr_task.leave_warning
+        hr_task = hr_task.with_context(tz="Pacific/Kiritimati")
+        hr_task._recompute_leave_warning()
+        self.assertEqual(hr_task.leave_warning, warning)
+        # Renaming the employee updates the stored message
+        self.john_doe_employee.name = "Johnny Doe"
+        self.assertIn("Johnny Doe", hr_task.leave_warning)
+        holiday.unlink()
+        self.assertFalse(hr_task.leave_warning)
+
+    def test_05_hr_task_search_overlapping(self):
+        hr_task = self.create_hr_task()
+        HrTask = self.env["hr.task"]
+        employee = self.john_doe_employee
+        self.assertIn(
+            hr_task,
+            HrTask._search_overlapping(employee, hr_task.date_end, hr_task.date_end),
+        )
+        self.assertIn(
+            hr_task,
+            HrTask._search_overlapping(
+                None,
+                hr_task.date_start - relativedelta(days=1),
+                hr_task.date_start,
+                domain=[("state", "=", "planified")],
+            ),
+        )
+        self.assertNotIn(
+            hr_task,
+            HrTask._search_overlapping(
+                employee,
+                hr_task.date_end + relativedelta(seconds=1),
+                hr_task.date_end + relativedelta(days=1),
+            ),
+        )
+        self.assertFalse(
+            HrTask._search_overlapping(
+                self.env["hr.employee"], hr_task.date_start, hr_task.date_end
+            )
+        )
+
+    def test_06_hr_task_count(self):
+        self.create_hr_task("project")
+        self.create_hr_task("project")
+        self.create_hr_task("ticket")
+        other_project = self.env["project.project"].create({"name": "Other"})
+        projects = self.project | other_project
+        self.assertEqual(projects.mapped("hr_task_count"), [2, 0])
+        self.assertEqual(self.ticket.hr_task_count, 1)
+        self.assertEqual(self.task.hr_task_count, 0)
+
+    def test_07_hr_task_recurrency_preview(self):
+        hr_task = self.create_hr_task()
+        hr_task.write({"repeat": True, "repeat_type": "forever", "repeat_unit": "week"})
+        recurrency = hr_task.recurrency_id
+        latest_task = recurrency._get_latest_task(recurrency)
+        task_count = len(recurrency.task_ids)
+
+        occurrences = recurrency.preview_occurrences(limit=3)
+        self.assertEqual(len(occurrences), 3)
+        self.assertEqual(len(recurrency.task_ids), task_count)
+        for week, (date_start, date_end) in enumerate(occurrences, start=1):
+            self.assertEqual(
+                date_start,
+                self.env["hr.task"]._add_delta_with_dst(
+                    latest_task.date_start, relativedelta(weeks=week)
+                ),
+            )
+            self.assertEqual(
+                date_end - date_start, latest_task.date_end - latest_task.date_start
+            )
+
+    def test_08_hr_task_recurrency_replan(self):
+        hr_task = self.create_hr_task()
+        hr_task.write({"repeat": True, "repeat_type": "forever", "repeat_unit": "week"})
+        weekly_tasks = hr_task.recurrency_id.task_ids - hr_task
+
+        hr_task.write({"repeat_interval": 2})
+        tasks = hr_task.recurrency_id.task_ids - hr_task
+        self.assertEqual(
+            sorted(tasks.mapped("date_start")),
+            [
+                self.env["hr.task"]._add_delta_with_dst(
+                    hr_task.date_start, relativedelta(weeks=2 * i)
+                )
+                for i in range(1, len(tasks) + 1)
+            ],
+        )
+        # Occurrences still matching the new rule are kept, not recreated
+        self.assertTrue(tasks & weekly_tasks)
+        self.assertFalse((weekly_tasks - tasks).exists())
+
+        # Occurrences deleted on purpose do not come back on the next replan
+        deleted_task = tasks.sorted("date_start")[0]
+        deleted_date = deleted_task.date_start
+        deleted_task.unlink()
+        hr_task.write({"repeat_interval": 2})
+        self.assertNotIn(
+            deleted_date, hr_task.recurrency_id.task_ids.mapped("date_start")
+        )
+
+    def test_08_hr_task_recurrency_replan_denser(self):
+        hr_task = self.create_hr_task()
+        hr_task.write(
+            {
+                "repeat": True,
+                "repeat_type": "forever",
+                "repeat_unit": "week",
+                "repeat_interval": 2,
+            }
+        )
+        biweekly_tasks = (hr_task.recurrency_id.task_ids - hr_task).sorted("date_start")
+        deleted_date = biweekly_tasks[0].date_start
+        biweekly_tasks[0].unlink()
+
+        hr_task.write({"repeat_interval": 1})
+        dates = (hr_task.recurrency_id.task_ids - hr_task).mapped("date_start")
+        # The weeks between the former occurrences are filled, the deleted
+        # occurrence is not created again
+        weekly_dates = [
+            self.env["hr.task"]._add_delta_with_dst(
+                hr_task.date_start, relativedelta(weeks=i)
+            )
+            for i in range(1, len(dates) + 2)
+        ]
+        self.assertEqual(
+            sorted(dates), [date for date in weekly_dates if date != deleted_date]
+        )
+        self.assertFalse((biweekly_tasks[1:] - hr_task.recurrency_id.task_ids))
+
+    def test_09_hr_task_state_transitions(self):
+        hr_task = self.create_hr_task()
+        hr_task.write({"date_start": fields.Datetime.now() - relativedelta(hours=2)})
+        cron = self.env.ref("hr_planning_resources.ir_cron_hr_task")
+        self.assertTrue(
+            self.env["ir.cron.trigger"].search([("cron_id", "=", cron.id)]),
+            "Moving the start of a task must trigger the state cron",
+        )
+        self.env["hr.task"].cron_update_task_state()
+        self.assertEqual(hr_task.state, "in_progress")
+        hr_task.date_end = fields.Datetime.now() - relativedelta(hours=1)
+        self.env["hr.task"].cron_update_task_state()
+        self.assertEqual(hr_task.state, "finished")
+
+    def test_10_hr_task_timeline_data(self):
+        hr_task = self.create_hr_task()
+        rows = self.env["hr.task"].get_timeline_data(
+            [("employee_id", "=", self.john_doe_employee.id)],
+            date_from=fields.Datetime.to_string(hr_task.date_start),
+            date_to=fields.Datetime.to_string(hr_task.date_end),
+            group_by=["employee_id"],
+        )
+        self.assertEqual([row["id"] for row in rows], hr_task.ids)
+        self.assertNotIn("leave_warning", rows[0])
+        self.assertEqual(rows[0]["employee_id"][0], self.john_doe_employee.id)
+        # The rows of the window are returned whatever their group, the
+        # timeline adds the groups it does not display yet
+        other_task = hr_task.copy(
+            {"employee_id": self.env["hr.employee"].create({"name": "Other"}).id}
+        )
+        rows = self.env["hr.task"].get_timeline_data(
+            [],
+            date_from=fields.Datetime.to_string(hr_task.date_start),
+            date_to=fields.Datetime.to_string(hr_task.date_end),
+            group_by=["employee_id"],
+        )
+        self.assertEqual(
+            {row["id"] for row in rows} & set((hr_task | other_task).ids),
+            set((hr_task | other_task).ids),
+        )
+        # Outside of the window nothing is returned
+        rows = self.env["hr.task"].get_timeline_data(
+            [("id", "in", (hr_task | other_task).ids)],
+            date_from=fields.Datetime.to_string(
+                hr_task.date_end + relativedelta(days=1)
+            ),
+            date_to=fields.Datetime.to_string(hr_task.date_end + relativedelta(days=2)),
+        )
+        self.assertFalse(rows)
+        self.assertEqual(
+            hr_task._get_timeline_notifications("write"),
+            [
+                (
+                    f"hr_planning_resources.timeline_{hr_task.company_id.id}",
+                    "hr_task_changed",
+                    {"event": "write", "ids": hr_task.ids},
+                )
+            ],
+        )
+        # A task moved to another company is notified on both channels
+        other_company = self.env["res.company"].create({"name": "Other Company"})
+        notifications = hr_task._get_timeline_notifications(
+            "write", {hr_task.id: other_company.id}
+        )
+        self.assertEqual(
+            {channel for channel, _type, _payload in notifications},
+            {
+                f"hr_planning_resources.timeline_{hr_task.company_id.id}",
+                f"hr_planning_resources.timeline_{other_company.id}",
+            },
+        )
+
+    def test_11_hr_employee_capacity(self):
+        Capacity = self.env["hr.employee.capacity"]
+        employee = self.john_doe_employee
+        today = fields.Date.context_today(Capacity)
+        date_to = today + relativedelta(days=13)
+        Capacity._refresh(employee, today, date_to)
+        capacity = Capacity.search(
+            [
+                ("employee_id", "=", employee.id),
+                ("date", ">=", today),
+                ("date", "<=", date_to),
+            ]
+        )
+        hours = employee._get_work_days_data_batch(
+            datetime.combine(today, time.min),
+            datetime.combine(date_to, time.max),
+            compute_leaves=False,
+        )[employee.id]["hours"]
+        self.assertAlmostEqual(sum(capacity.mapped("capacity_hours")), hours, places=2)
+
+        # The whole days of a slot are read from the capacity
+        HrTask = self.env["hr.task"]
+        tz = pytz.timezone(employee.tz or "UTC")
+        slot = tuple(
+            [employee]
+            + [
+                tz.localize(datetime.combine(day, time.min))
+                .astimezone(pytz.utc)
+                .replace(tzinfo=None)
+                for day in (today, date_to)
+            ]
+        )
+        self.assertAlmostEqual(
+            HrTask._get_work_hours_batch([slot])[0],
+            HrTask._get_calendar_hours_batch([slot])[0],
+            places=2,
+        )
+
+        # A new working schedule drops the upcoming capacity until the cron
+        employee.resource_calendar_id = employee.resource_calendar_id.copy()
+        domain = [("employee_id", "=", employee.id), ("date", ">=", today)]
+        self.assertFalse(Capacity.search(domain))
+        Capacity._cron_fill_horizon()
+        self.assertEqual(
+            Capacity.search_count(domain),
+            (Capacity._get_horizon_end() - today).days + 1,
+        )
+        # So does a new timezone, of the employee or of its resource
+        employee.tz = "Pacific/Kiritimati"
+        self.assertFalse(Capacity.search(domain))
+        Capacity._cron_fill_horizon()
+        employee.resource_id.tz = "Europe/Brussels"
+        self.assertFalse(Capacity.search(domain))
+
+    def test_12_hr_task_find_conflicts(self):
+        hr_task = self.create_hr_task()
+        overlapping_task = self.create_hr_task("project")
+        next_start = hr_task.date_end + relativedelta(days=2)
+        next_task = hr_task.copy({"date_start": next_start, "date_end": next_start})
+        conflicts = self.env["hr.task"].find_conflicts(
+            self.john_doe_employee.ids, hr_task.date_start, hr_task.date_end
+        )
+        self.assertEqual(len(conflicts), 1)
+        self.assertEqual(set(conflicts[0]), {hr_task.id, overlapping_task.id})
+        self.assertTrue(hr_task.has_conflict)
+        self.assertFalse(next_task.has_conflict)
+
+        overlapping_task.action_cancel()
+        hr_task.invalidate_recordset(["has_conflict"])
+        self.assertFalse(hr_task.has_conflict)
+
+    def test_13_create_hr_task_wizard(self):
+        other_user = self.env["res.users"].create(
+            {"name": "Jane Doe", "login": "test_user_2"}
+        )
+        self.env["hr.employee"].create({"name": "Jane Doe", "user_id": other_user.id})
+        other_task = self.task.copy()
+        tasks = self.task | other_task
+        action = tasks.action_create_hr_task()
+        wizard = (
+            self.env["create.hr.task"]
+            .with_context(**action["context"])
+            .create(
+                {
+                    "user_ids": [(6, 0, (self.john_doe_user | other_user).ids)],
+                    "date_start": fields.Datetime.now(),
+                    "date_end": fields.Datetime.now() + relativedelta(hours=8),
+                }
+            )
+        )
+        wizard.action_confirm()
+        hr_tasks = self.env["hr.task"].search([("task_id", "in", tasks.ids)])
+        self.assertEqual(len(hr_tasks), 4)
+        self.assertEqual(hr_tasks.employee_id.user_id, self.john_doe_user | other_user)
+
+    def test_14_hr_task_scheduler(self):
+        hr_task = self.create_hr_task()
+        date_from = hr_task.date_start - relativedelta(days=1)
+        date_to = hr_task.date_end + relativedelta(days=14)
+        scheduler = self.env["hr.task.scheduler"]
+        result = scheduler.propose(
+            [(self.task, 4.0), (self.ticket, 4.0), (self.project, 10000.0)],
+            self.department,
+            date_from,
+            date_to,
+        )
+        self.assertEqual(len(result["proposals"]), 2)
+        self.assertEqual(result["unplanned"], [(self.project, 10000.0)])
+        first, second = result["proposals"]
+        self.assertEqual(first["employee_id"], self.john_doe_employee.id)
+        self.assertLessEqual(first["date_end"], second["date_start"])
+        for values in result["proposals"]:
+            self.assertTrue(
+                values["date_end"] <= hr_task.date_start
+                or values["date_start"] >= hr_task.date_end
+            )
+        hr_tasks = scheduler.confirm(result["proposals"])
+        self.assertEqual(hr_tasks.mapped("type"), ["task", "ticket"])
+        self.assertEqual(hr_tasks[0].allocated_hours, 4.0)
+
+    def test_15_hr_task_profiling(self):
+        self.env["ir.config_parameter"].sudo().set_param(
+            "hr_planning_resources.profiling", "db"
+        )
+        hr_task = self.create_hr_task()
+        self.env["hr.task"].cron_update_task_state()
+        samples = self.env["hr.task.perf.sample"].search([])
+        self.assertIn("_compute_allocated_hours", samples.mapped("name"))
+        self.assertIn("cron_update_task_state", samples.mapped("name"))
+
+        # Calls that fail are not recorded
+        def failing_method(records):
+            raise UserError("Failure")
+
+        with self.assertRaises(UserError):
+            profiled(failing_method)(hr_task)
+        self.assertEqual(self.env["hr.task.perf.sample"].search([]), samples)
+        # Recent samples are kept by the garbage collection
+        self.env["hr.task.perf.sample"]._gc_samples()
+        self.assertEqual(self.env["hr.task.perf.sample"].search([]), samples)
+        self.env["ir.config_parameter"].sudo().set_param(
+            "hr_planning_resources.profiling", False
+        )
+        hr_task.date_end += relativedelta(hours=1)
+        hr_task.flush_recordset()
+        self.assertEqual(self.env["hr.task.perf.sample"].search_count([]), len(samples))
+
+    def test_16_resource_calendar_work_intervals_cache(self):
+        calendar = self.john_doe_employee.resource_calendar_id
+        resource = self.john_doe_employee.resource_id
+        hr_task = self.create_hr_task()
+        start = pytz.utc.localize(hr_task.date_start)
+        end = pytz.utc.localize(hr_task.date_end)
+        intervals = calendar._get_work_intervals(start, end, resource)[resource.id]
+        self.assertTrue(
+            all(
+                interval_start.tzinfo == pytz.utc and interval_stop.tzinfo == pytz.utc
+                for interval_start, interval_stop in intervals
+            )
+        )
+        with self.assertQueryCount(0):
+            self.assertEqual(
+                calendar._get_work_intervals(start, end, resource)[resource.id],
+                intervals,
+            )
+        self.env["resource.calendar.leaves"].create(
+            {
+                "name": "Time Off",
+                "resource_id": resource.id,
+                "calendar_id": calendar.id,
+                "date_from": hr_task.date_start,
+                "date_to": hr_task.date_end,
+            }
+        )
+        self.assertFalse(
+            calendar._get_work_intervals(start, end, resource)[resource.id]
+        )
+        # Only the expansions of the changed calendar are dropped
+        other_calendar = calendar.copy()
+        other_calendar._get_work_intervals(start, end)
+        version = other_calendar.work_intervals_version
+        calendar.attendance_ids[0].hour_to -= 1
+        self.assertEqual(other_calendar.work_intervals_version, version)
+        with self.assertQueryCount(0):
+            other_calendar._get_work_intervals(start, end)
+
+    def test_17_hr_task_archive(self):
+        hr_task = self.create_hr_task()
+        date_start = hr_task.date_start - relativedelta(years=2)
+        hr_task.write(
+            {
+                "date_start": date_start,
+                "date_end": date_start + relativedelta(hours=8),
+                "state": "finished",
+            }
+        )
+        recent_task = self.create_hr_task("project")
+        recent_task.action_cancel()
+        task_id = hr_task.id
+        self.env["hr.task.archive"]._cron_archive()
+        self.assertFalse(hr_task.exists())
+        self.assertTrue(recent_task.exists())
+        archive = self.env["hr.task.archive"].search([("origin_id", "=", task_id)])
+        self.assertEqual(archive.employee_id, self.john_doe_employee)
+        self.assertEqual(archive.state, "finished")
+        history = self.env["hr.task.history"].search(
+            [("employee_id", "=", self.john_doe_employee.id)]
+        )
+        self.assertEqual(sorted(history.mapped("is_archived")), [False, True])
+
+    def test_18_hr_task_virtual_occurrences(self):
+        self.env["ir.config_parameter"].sudo().set_param(
+            "hr_planning_resources.virtual_occurrences", True
+        )
+        hr_task = self.create_hr_task()
+        hr_task.write({"repeat": True, "repeat_type": "forever", "repeat_unit": "week"})
+        recurrency = hr_task.recurrency_id
+        self.assertEqual(recurrency.task_ids, hr_task)
+
+        HrTask = self.env["hr.task"]
+        date_from = hr_task.date_start
+        date_to = hr_task.date_start + relativedelta(weeks=3)
+        rows = HrTask.get_timeline_data([], date_from, date_to)
+        virtual_rows = [row for row in rows if row.get("virtual")]
+        self.assertEqual(len(virtual_rows), 2)
+        self.assertEqual(
+            virtual_rows[0]["date_start"], hr_task.date_start + relativedelta(weeks=1)
+        )
+
+        task_ids = HrTask.materialize_virtual_occurrences([virtual_rows[0]["id"]])
+        task = HrTask.browse(task_ids)
+        self.assertEqual(task.recurrency_id, recurrency)
+        self.assertEqual(task.recurrence_date, virtual_rows[0]["date_start"])
+        task.write({"date_start": task.date_start + relativedelta(hours=1)})
+        rows = HrTask.get_timeline_data([], date_from, date_to)
+        self.assertEqual(len([row for row in rows if row.get("virtual")]), 1)
+        self.assertIn(task.id, [row["id"] for row in rows])
+
+        # Windows far from the anchor are expanded from their own start
+        date_from = hr_task.date_start + relativedelta(years=10)
+        date_to = date_from + relativedelta(weeks=2)
+        rows = HrTask.get_timeline_data([], date_from, date_to)
+        virtual_rows = [row for row in rows if row.get("virtual")]
+        self.assertGreaterEqual(len(virtual_rows), 2)
+        self.assertTrue(
+            all(
+                row["date_end"] > date_from and row["date_start"] < date_to
+                for row in virtual_rows
+            )
+        )
+
+        # The anchor is never archived, however old
+        hr_task.state = "finished"
+        archivable_domain = self.env["hr.task.archive"]._get_archivable_domain(
+            hr_task.date_end + relativedelta(years=20)
+        )
+        self.assertNotIn(hr_task, HrTask.search(archivable_domain))
+
+        # Without virtual occurrences, the cron generates the recurrency
+        self.env["ir.config_parameter"].sudo().set_param(
+            "hr_planning_resources.virtual_occurrences", False
+        )
+        self.assertFalse(recurrency.last_generated_end_datetime)
+        self.env["hr.task.recurrency"]._cron_schedule_next()
+        self.assertTrue(recurrency.last_generated_end_datetime)
+
+    def test_19_hr_task_export(self):
+        hr_task = self.create_hr_task()
+        employee = self.john_doe_employee
+        employee.action_reset_planning_calendar_token()
+        self.assertIn(employee.planning_calendar_token, employee.planning_calendar_url)
+
+        controller = HrPlanningExport()
+        ical = "".join(
+            controller._generate_ical(self.env, hr_task.ids, calendar_name="John")
+        )
+        self.assertTrue(ical.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertIn("UID:hr-task-%s@" % hr_task.id, ical)
+        self.assertIn(
+            "DTSTART:%s" % hr_task.date_start.strftime("%Y%m%dT%H%M%SZ"), ical
+        )
+        rows = "".join(controller._generate_csv(self.env, hr_task.ids)).splitlines()
+        self.assertEqual(len(rows), 2)
+        self.assertIn(employee.name, rows[1])
+
+        self.assertEqual(
+            controller._parse_csv_params("2024-01-01", "2024-01-31", "1,2"),
+            (datetime(2024, 1, 1), datetime(2024, 1, 31), [1, 2]),
+        )
+        for params in (
+            ("2024-01-01", "not a date", None),
+            ("2024-01-31", "2024-01-01", None),
+            ("2024-01-01", "2024-01-31", "1,john"),
+        ):
+            with self.assertRaises(BadRequest):
+                controller._parse_csv_params(*params)
+
+    def test_20_hr_task_utilization(self):
+        hr_task = self.create_hr_task()
+        employee = self.john_doe_employee
+        Capacity = self.env["hr.employee.capacity"]
+        tz = pytz.timezone(employee.tz or "UTC")
+        week = pytz.utc.localize(hr_task.date_start).astimezone(tz).date()
+        week -= relativedelta(days=week.weekday())
+        Capacity._refresh(employee, week, week + relativedelta(days=6))
+        self.env.flush_all()
+
+        Utilization = self.env["hr.task.utilization"]
+        line = Utilization.search(
+            [("employee_id", "=", employee.id), ("week", "=", week)]
+        )
+        self.assertEqual(len(line), 1)
+        # The id does not depend on the other rows of the view
+        self.assertEqual(
+            line.id, employee.id * 100000 + (week - date(1970, 1, 5)).days // 7
+        )
+        self.assertAlmostEqual(line.planned_hours, hr_task.allocated_hours, places=2)
+        capacity = Capacity.search([("employee_id", "=", employee.id)])
+        self.assertAlmostEqual(
+            line.available_hours,
+            sum(capacity.mapped("capacity_hours"))
+            - sum(capacity.mapped("leave_hours")),
+            places=2,
+        )
+
+        # Weeks outside of the capacity horizon have no available hours
+        next_start = hr_task.date_start + relativedelta(years=2)
+        hr_task.copy({"date_start": next_start, "date_end": next_start})
+        self.env.flush_all()
+        self.env.cr.execute(
+            f"""
+            SELECT available_hours FROM {Utilization._table}
+            WHERE employee_id = %s AND week > %s
+            """,
+            (employee.id, week),
+        )
+        self.assertEqual(self.env.cr.fetchall(), [(None,)])
+
+    def test_21_hr_task_my_department(self):
+        hr_task = self.create_hr_task()
+        other_employee = self.env["hr.employee"].create({"name": "Jane Doe"})
+        other_task = hr_task.copy({"employee_id": other_employee.id})
+        self.assertEqual(hr_task.user_id, self.john_doe_user)
+        self.assertEqual(hr_task.department_id, self.department)
+
+        HrTask = self.env["hr.task"].with_user(self.john_doe_user)
+        tasks = HrTask.search([("member_of_department", "=", True)])
+        self.assertIn(hr_task, tasks)
+        self.assertNotIn(other_task, tasks)
+        # The tasks without department are outside of the user's department
+        self.assertFalse(other_task.department_id)
+        self.assertIn(other_task, HrTask.search([("member_of_department", "!=", True)]))
+        other_tasks = HrTask.search([("member_of_department", "=", False)])
+        self.assertIn(other_task, other_tasks)
+        self.assertNotIn(hr_task, other_tasks)
+
+        sub_department = self.env["hr.department"].create(
+            {"name": "Sub Department", "parent_id": self.department.id}
+        )
+        other_employee.department_id = sub_department
+        self.assertEqual(other_task.department_id, sub_department)
+        self.assertIn(other_task, HrTask.search([("member_of_department", "=", True)]))
+        self.assertTrue(other_task.with_user(self.john_doe_user).member_of_department)
+        self.assertNotIn(
+            other_task, HrTask.search([("member_of_department", "!=", True)])
+        )
+
+    def test_22_hr_task_recurrency_batch_fallback(self):
+        # A failing recurrency does not prevent the others from generating
+        hr_task = self.create_hr_task()
+        other_task = hr_task.copy(
+            {"employee_id": self.env["hr.employee"].create({"name": "Jane Doe"}).id}
+        )
+        recurrencies = self.env["hr.task.recurrency"].create(
+            [
+                {"repeat_interval": 1, "repeat_unit": "week", "repeat_type": "forever"}
+                for _task in range(2)
+            ]
+        )
+        hr_task.recurrency_id = recurrencies[0]
+        other_task.recurrency_id = recurrencies[1]
+        # The next occurrence of the second recurrency is already booked
+        next_start = self.env["hr.task"]._add_delta_with_dst(
+            other_task.date_start, relativedelta(weeks=1)
+        )
+        other_task.copy(
+            {
+                "recurrency_id": False,
+                "date_start": next_start,
+                "date_end": next_start + (other_task.date_end - other_task.date_start),
+            }
+        )
+        self.env["ir.config_parameter"].sudo().set_param(
+            "hr_planning_resources.block_double_booking", True
+        )
+        task_ids = recurrencies._repeat_task(
+            hr_task.date_start + relativedelta(weeks=3)
+        )
+        self.assertTrue(task_ids)
+        tasks = self.env["hr.task"].browse(task_ids)
+        self.assertEqual(tasks.recurrency_id, recurrencies[0])
+        self.assertEqual(other_task.recurrency_id.task_ids, other_task)
+
+    def test_23_hr_task_recurrency_schedule_chunk_size(self):
+        # An invalid chunk size falls back to the default one
+        hr_task = self.create_hr_task()
+        hr_task.write({"repeat": True, "repeat_type": "forever", "repeat_unit": "week"})
+        ICP = self.env["ir.config_parameter"].sudo()
+        ICP.set_param("hr_planning_resources.schedule_time_budget", 0)
+        for chunk_size in ("0", "-1", "many"):
+            ICP.set_param("hr_planning_resources.schedule_chunk_size", chunk_size)
+            self.env["hr.task.recurrency"]._cron_schedule_next()
+            self.assertFalse(
+                ICP.get_param("hr_planning_resources.schedule_cycle_start")
+            )
+
+    def test_24_hr_task_recurrency_timezone(self):
+        # 2026-03-23 09:00 in Brussels, the week before its DST switch
+        hr_task = self.create_hr_task()
+        hr_task.write(
+            {
+                "date_start": datetime(2026, 3, 23, 8),
+                "date_end": datetime(2026, 3, 23, 16),
+            }
+        )
+        recurrency = self.env["hr.task.recurrency"].create(
+            {"repeat_interval": 1, "repeat_unit": "week", "repeat_type": "forever"}
+        )
+        hr_task.recurrency_id = recurrency
+        self.john_doe_employee.tz = "Europe/Brussels"
+        self.env.user.tz = "America/New_York"
+
+        def next_start():
+            return next(
+                recurrency._get_occurrence_dates(recurrency, hr_task.date_start)
+            )
+
+        # Generated tasks keep the timezone of hr.task._add_delta_with_dst
+        self.assertEqual(
+            next_start(),
+            self.env["hr.task"]._add_delta_with_dst(
+                hr_task.date_start, relativedelta(weeks=1)
+            ),
+        )
+        self.assertEqual(next_start(), datetime(2026, 3, 30, 8))
+        # Virtual occurrences keep the wall-clock time of the employee
+        self.env["ir.config_parameter"].sudo().set_param(
+            "hr_planning_resources.virtual_occurrences", True
+        )
+        self.assertEqual(next_start(), datetime(2026, 3, 30, 7))
@@ -0,0 +1,83 @@
+import logging
+import time
+from contextlib import contextmanager
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import TestHrPlanningCommon
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged("post_install", "-at_install", "-standard", "hr_planning_benchmark")
+class TestHrTaskBenchmark(TestHrPlanningCommon):
+    """
+    Times the planning hot paths on a generated dataset.
+
+    Not part of the standard tests, run it with
+    ``--test-tags hr_planning_benchmark``.
+    """
+
+    EMPLOYEE_COUNT = 50
+    TASK_COUNT = 2000
+    LEAVE_COUNT = 200
+    RECURRENCY_COUNT = 20
+
+    def setUp(self):
+        super().setUp()
+        self.employees, self.tasks, self.leaves = self.create_planning_data(
+            self.EMPLOYEE_COUNT,
+            self.TASK_COUNT,
+            leave_count=self.LEAVE_COUNT,
+            recurrency_count=self.RECURRENCY_COUNT,
+        )
+        self.env.flush_all()
+        self.env.invalidate_all()
+
+    @contextmanager
+    def benchmark(self, scenario, records=None):
+        sql_count = self.cr.sql_log_count
+        started = time.perf_counter()
+        yield
+        self.env.flush_all()
+        _logger.info(
+            "Benchmark %s: %d records, %.3f s, %d queries",
+            scenario,
+            len(records) if records is not None else 0,
+            time.perf_counter() - started,
+            self.cr.sql_log_count - sql_count,
+        )
+        self.env.invalidate_all()
+
+    def test_benchmark_compute_allocated_hours(self):
+        with self.benchmark("_compute_allocated_hours", self.tasks):
+            self.tasks._compute_allocated_hours()
+
+    def test_benchmark_compute_leave_warning(self):
+        with self.benchmark("_compute_leave_warning", self.tasks):
+            self.tasks._compute_leave_warning()
+
+    def test_benchmark_cron_schedule_next(self):
+        recurrencies = self.env["hr.task.recurrency"].search([])
+        with self.benchmark("_cron_schedule_next", recurrencies):
+            recurrencies._cron_schedule_next()
+
+    def test_benchmark_cron_update_task_state(self):
+        with self.benchmark("cron_update_task_state", self.tasks):
+            self.env["hr.task"].cron_update_task_state()
+
+    def test_benchmark_timeline_data(self):
+        date_from = fields.Datetime.now()
+        with self.benchmark("get_timeline_data", self.tasks):
+            self.env["hr.task"].get_timeline_data(
+                [], date_from, date_from + relativedelta(days=31)
+            )
+
+    def test_benchmark_write_recurrence(self):
+        tasks = self.tasks[: self.RECURRENCY_COUNT]
+        with self.benchmark("write recurrence", tasks):
+            for task in tasks:
+                task.write({"repeat_interval": 2})
@@ -0,0 +1,124 @@
+from dateutil.relativedelta import relativedelta
+
+from odoo import fields
+from odoo.tests.common import warmup
+
+from .common import TestHrPlanningCommon
+
+SMALL_SIZE = 5
+LARGE_SIZE = 20
+# Query budgets of the batch operations, the same for both batch sizes
+CREATE_QUERY_BUDGET = 60
+WRITE_DATES_QUERY_BUDGET = 45
+RECURRENCE_QUERY_BUDGET = 70
+LEAVE_WARNING_QUERY_BUDGET = 20
+
+
+class TestHrTaskQueryCount(TestHrPlanningCommon):
+    def setUp(self):
+        super().setUp()
+        self.date_start = fields.Datetime.now().replace(
+            minute=0, second=0, microsecond=0
+        ) + relativedelta(days=1)
+
+    def _prepare_task_values_list(self, size):
+        return [
+            {
+                "employee_id": self.john_doe_employee.id,
+                "task_id": self.task.id,
+                "type": "task",
+                "date_start": self.date_start,
+                "date_end": self.date_start + relativedelta(hours=8),
+            }
+            for _index in range(size)
+        ]
+
+    def _create_tasks(self, size):
+        return self.env["hr.task"].create(self._prepare_task_values_list(size))
+
+    def assertQueryBudget(self, operation, batches, budget):
+        """
+        Runs ``operation`` on each batch and checks that none of them costs
+        more than ``budget`` queries, whatever its size.
+        """
+        for batch in batches:
+            self.env.flush_all()
+            self.env.invalidate_all()
+            with self.assertQueryCount(budget):
+                operation(batch)
+                self.env.flush_all()
+
+    @warmup
+    def test_batch_create(self):
+        self.assertQueryBudget(
+            self.env["hr.task"].create,
+            [
+                self._prepare_task_values_list(SMALL_SIZE),
+                self._prepare_task_values_list(LARGE_SIZE),
+            ],
+            CREATE_QUERY_BUDGET,
+        )
+
+    @warmup
+    def test_batch_write_dates(self):
+        date_start = self.date_start + relativedelta(days=1)
+
+        def write_dates(tasks):
+            tasks.write(
+                {
+                    "date_start": date_start,
+                    "date_end": date_start + relativedelta(hours=4),
+                }
+            )
+
+        self.assertQueryBudget(
+            write_dates,
+            [self._create_tasks(SMALL_SIZE), self._create_tasks(LARGE_SIZE)],
+            WRITE_DATES_QUERY_BUDGET,
+        )
+
+    @warmup
+    def test_recurrence_generation(self):
+        def create_recurrencies(size):
+            recurrencies = self.env["hr.task.recurrency"].create(
+                [
+                    {
+                        "repeat_interval": 1,
+                        "repeat_unit": "week",
+                        "repeat_type": "forever",
+                    }
+                    for _index in range(size)
+                ]
+            )
+            for task, recurrency in zip(self._create_tasks(size), recurrencies):
+                task.recurrency_id = recurrency
+            return recurrencies
+
+        stop_datetime = self.date_start + relativedelta(months=1)
+        self.assertQueryBudget(
+            lambda recurrencies: recurrencies._repeat_task(stop_datetime),
+            [create_recurrencies(SMALL_SIZE), create_recurrencies(LARGE_SIZE)],
+            RECURRENCE_QUERY_BUDGET,
+        )
+
+    @warmup
+    def test_leave_warning_read(self):
+        self.env["resource.calendar.leaves"].create(
+            {
+                "name": "Time Off",
+                "resource_id": self.john_doe_employee.resource_id.id,
+                "calendar_id": self.john_doe_employee.resource_calendar_id.id,
+                "date_from": self.date_start,
+                "date_to": self.date_start + relativedelta(hours=4),
+            }
+        )
+
+        def read_leave_warning(tasks):
+            tasks._recompute_leave_warning()
+            tasks.mapped("leave_warning")
+
+        self.assertQueryBudget(
+            read_leave_warning,
+            [self._create_tasks(SMALL_SIZE), self._create_tasks(LARGE_SIZE)],
+            LEAVE_WARNING_QUERY_BUDGET,
+        )
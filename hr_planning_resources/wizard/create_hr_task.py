@@ -6,7 +6,7 @@ class CreateHrTask(models.TransientModel):
     _name = "create.hr.task"
     _description = "Create HR Task"
 
-    user_id = fields.Many2one(
+    user_ids = fields.Many2many(
         "res.users", string="Users", default=lambda self: self.env.user
     )
     date_start = fields.Datetime(string="Start Date", required=True)
@@ -21,19 +21,34 @@ class CreateHrTask(models.TransientModel):
         }
         return type_map.get(res_model, False)
 
+    def _get_res_ids(self):
+        """Returns the ids of the records to plan, taken from the context."""
+        context = self.env.context
+        if context.get("default_res_ids"):
+            return context["default_res_ids"]
+        if context.get("default_res_id"):
+            return [context["default_res_id"]]
+        if context.get("active_model") == context.get("default_res_model"):
+            return context.get("active_ids", [])
+        return []
+
     def action_confirm(self):
         # Retrieve context parameters
         res_model = self.env.context.get("default_res_model")
-        res_id = self.env.context.get("default_res_id")
+        res_ids = self._get_res_ids()
 
         # Input validation with descriptive error messages
         if not res_model:
             raise UserError(_("No default resource model specified."))
-        if not res_id:
+        if not res_ids:
             raise UserError(_("No active record id provided."))
-        if not self.user_id.employee_id:
+        if not self.user_ids:
+            raise UserError(_("Select at least one user."))
+        users_without_employee = self.user_ids.filtered(lambda u: not u.employee_id)
+        if users_without_employee:
             raise UserError(
-                _("The selected user does not have an associated employee.")
+                _("The following users do not have an associated employee: %s")
+                % ", ".join(users_without_employee.mapped("name"))
             )
 
         # Determine the record type
@@ -41,27 +56,33 @@ class CreateHrTask(models.TransientModel):
         if not record_type:
             raise UserError(_("Unsupported resource model: %s") % res_model)
 
-        # Fetch the active record
-        record = self.env[res_model].browse(res_id)
-        if not record.exists():
+        # Fetch the active records
+        records = self.env[res_model].browse(res_ids).exists()
+        if len(records) != len(set(res_ids)):
             raise UserError(_("The record does not exist."))
 
-        # Retrieve or create hr.task records
+        # Create one hr.task per record and user at once
         hr_task_sudo = self.env["hr.task"].sudo()
-        task_values = {
-            "type": record_type,
-            "employee_id": self.user_id.employee_id.id,
-            "date_start": self.date_start,
-            "date_end": self.date_end,
-            "task_id": res_id if record_type == "task" else False,
-            "project_id": res_id if record_type == "project" else False,
-            "ticket_id": res_id if record_type == "ticket" else False,
-        }
-        hr_task = hr_task_sudo.create(task_values)
+        task_values_list = [
+            {
+                "type": record_type,
+                "employee_id": user.employee_id.id,
+                "date_start": self.date_start,
+                "date_end": self.date_end,
+                "task_id": record.id if record_type == "task" else False,
+                "project_id": record.id if record_type == "project" else False,
+                "ticket_id": record.id if record_type == "ticket" else False,
+            }
+            for record in records
+            for user in self.user_ids
+        ]
+        hr_tasks = hr_task_sudo.create(task_values_list)
 
-        message = _(
-            f"{hr_task.name} task created between {hr_task.date_start} and {hr_task.date_end}."
-        )
+        message = _("%(count)s tasks created between %(start)s and %(end)s.") % {
+            "count": len(hr_tasks),
+            "start": self.date_start,
+            "end": self.date_end,
+        }
 
         # Return notification message
         return {